@@ -1,6 +1,7 @@
 import gradio as gr
 import os
 import sys
+import threading
 import warnings
 from pathlib import Path
 from dotenv import load_dotenv
@@ -16,6 +17,7 @@ from theme_classifier import ThemeClassifier
 from character_network import NamedEntityRecognizer, CharacterNetworkGenerator
 from text_classification import JutsuClassifier
 from character_chatbot import GeminiChatBot
+from jutsu_search import JutsuSearchIndex
 from components import create_navbar, create_hero_section, create_footer, create_about_section
 
 load_dotenv()
@@ -24,14 +26,28 @@ load_dotenv()
 PROJECT_ROOT = Path(__file__).parent.absolute()
 STUBS_DIR = PROJECT_ROOT / "stubs"
 THEME_OUTPUT_PATH = STUBS_DIR / "theme_classifier_output.csv"
+THEME_SCORE_CACHE_PATH = STUBS_DIR / "theme_scores.sqlite"
 NER_OUTPUT_PATH = STUBS_DIR / "ner_output.csv"
+JUTSU_DATA_PATH = PROJECT_ROOT / "data" / "jutsus.jsonl"
+JUTSU_SEARCH_INDEX_PATH = PROJECT_ROOT / "data" / "jutsu_search.sqlite"
+
+# Built from the crawler output on first use and kept in step with it afterwards
+jutsu_search_index = None
+jutsu_search_index_lock = threading.Lock()
+# One classifier per (model, data path), built on the first click and reused by later ones
+jutsu_classifiers = {}
+jutsu_classifiers_lock = threading.Lock()
+# Classify clicks handled at once; concurrent clicks are run as one batch by the
+# classifier's micro-batcher, so this matches its max_batch_size
+CLASSIFY_CONCURRENCY_LIMIT = 16
 
 # Initialize the Gemini chatbot
 try:
     character_chatbot = GeminiChatBot()
+    # Only checks for the API key; the Gemini model is built on the first chat
     chatbot_available = character_chatbot.available
     if chatbot_available:
-        print("Gemini chatbot initialized successfully!")
+        print("Gemini API key found, the model is loaded on the first chat")
     else:
         print("Gemini chatbot failed to initialize")
 except Exception as e:
@@ -39,13 +55,22 @@ except Exception as e:
     chatbot_available = False
     character_chatbot = None
 
-def get_themes(theme_list_str, subtitles_path, save_path):
+def get_themes(theme_list_str, subtitles_path, save_path, backend="nli"):
     # Handle save path - if it's just a filename, use stubs directory
     if save_path and not ('/' in save_path or '\\' in save_path):
         save_path = str(STUBS_DIR / save_path)
+
+    # Each backend keeps its own output next to the NLI one
+    if save_path and backend != "nli":
+        root, ext = os.path.splitext(save_path)
+        save_path = f"{root}_{backend}{ext}"
+
+    # Without subtitles, score the scripts stored in the pre-computed NLI output
+    if not subtitles_path.strip():
+        subtitles_path = str(THEME_OUTPUT_PATH)
     
-    theme_list = theme_list_str.split(',')
-    theme_classifier = ThemeClassifier(theme_list)
+    theme_list = [theme.strip() for theme in theme_list_str.split(',') if theme.strip()]
+    theme_classifier = ThemeClassifier(theme_list, backend=backend, cache_path=THEME_SCORE_CACHE_PATH)
     output_df = theme_classifier.get_themes(subtitles_path, save_path)
     theme_list = [theme for theme in theme_list if theme != 'dialogue']
     output_df = output_df[theme_list]
@@ -73,19 +98,38 @@ def get_character_network(subtitles_path, ner_path):
     ner_df = ner.get_ners(subtitles_path, ner_path)
     
     character_network_generator = CharacterNetworkGenerator()
-    relationship_df = character_network_generator.generate_character_network(ner_df)
+    relationship_df = character_network_generator.generate_character_network(ner_df, source_path=ner_path)
     html = character_network_generator.draw_network_graph(relationship_df)
     return html
 
 def classify_text(text_classifcation_model, text_classifcation_data_path, text_to_classify):
-    jutsu_classifier = JutsuClassifier(
-        model_path=text_classifcation_model,
-        data_path=text_classifcation_data_path,
-        huggingface_token=os.getenv('huggingface_token')
-    )
+    key = (text_classifcation_model, text_classifcation_data_path)
+    with jutsu_classifiers_lock:
+        jutsu_classifier = jutsu_classifiers.get(key)
+        if jutsu_classifier is None:
+            jutsu_classifier = JutsuClassifier(
+                model_path=text_classifcation_model,
+                data_path=text_classifcation_data_path,
+                huggingface_token=os.getenv('huggingface_token'),
+                micro_batching=True,
+                max_batch_size=CLASSIFY_CONCURRENCY_LIMIT
+            )
+            jutsu_classifiers[key] = jutsu_classifier
     output = jutsu_classifier.classify_jutsu(text_to_classify)
     return output[0]
 
+def search_jutsus(query):
+    global jutsu_search_index
+    # Only one search builds or refreshes the index; concurrent ones wait for it
+    with jutsu_search_index_lock:
+        if jutsu_search_index is None:
+            jutsu_search_index = JutsuSearchIndex(JUTSU_SEARCH_INDEX_PATH, JUTSU_DATA_PATH)
+        jutsu_search_index.refresh()
+
+    results = jutsu_search_index.search(query, limit=20, refresh=False)
+    rows = [[result['jutsu_name'], result['jutsu_type'], result['snippet']] for result in results]
+    return gr.Dataframe(value=rows, headers=["Jutsu", "Type", "Description"])
+
 def main():
     # Use Gradio's built-in theme instead of custom CSS for HF Spaces compatibility
     theme = gr.themes.Soft(
@@ -129,9 +173,15 @@ def main():
                             value="theme_classifier_output.csv",
                             placeholder="Filename (saved in stubs/)"
                         )
+                        theme_backend = gr.Radio(
+                            choices=["nli", "embedding"],
+                            value="nli",
+                            label="Backend",
+                            info="nli: bart-large-mnli (accurate), embedding: fast similarity tier"
+                        )
                         get_themes_button = gr.Button("Analyze Themes", variant="primary")
                         # Using empty string for subtitles_path since we're using pre-computed data
-                        get_themes_button.click(get_themes, inputs=[theme_list, gr.Textbox(value="", visible=False), save_path], outputs=[plot])
+                        get_themes_button.click(get_themes, inputs=[theme_list, gr.Textbox(value="", visible=False), save_path, theme_backend], outputs=[plot])
 
         # Character Network Section
         with gr.Row(elem_id="network-section", elem_classes="section"):
@@ -181,7 +231,23 @@ def main():
                         )
                         classify_text_button = gr.Button("Classify Jutsu", variant="primary")
                         # Using empty string for data path since model is pre-trained
-                        classify_text_button.click(classify_text, inputs=[text_classifcation_model, gr.Textbox(value="", visible=False), text_to_classify], outputs=[text_classification_output])
+                        classify_text_button.click(classify_text, inputs=[text_classifcation_model, gr.Textbox(value="", visible=False), text_to_classify], outputs=[text_classification_output],
+                                                    concurrency_limit=CLASSIFY_CONCURRENCY_LIMIT)
+
+        # Jutsu Search Section
+        with gr.Row(elem_id="search-section", elem_classes="section"):
+            with gr.Column():
+                gr.HTML("<h2 style='color: #FF8C00 !important;'>Jutsu Search</h2>")
+                with gr.Row():
+                    jutsu_query = gr.Textbox(
+                        label='Search Jutsus',
+                        placeholder="e.g. fire release, sealing chains",
+                        scale=4
+                    )
+                    search_jutsus_button = gr.Button("Search", variant="primary", scale=1)
+                jutsu_search_results = gr.Dataframe(headers=["Jutsu", "Type", "Description"], wrap=True)
+                search_jutsus_button.click(search_jutsus, inputs=[jutsu_query], outputs=[jutsu_search_results])
+                jutsu_query.submit(search_jutsus, inputs=[jutsu_query], outputs=[jutsu_search_results])
 
        # Character Chatbot Section
         with gr.Row(elem_id="chat-section", elem_classes="section"):
@@ -195,7 +261,8 @@ def main():
                 # Separate chat interfaces for each character
                 with gr.Tab("Naruto"):
                     def chat_naruto(message, history):
-                        return character_chatbot.chat(message, history, "naruto")
+                        # Streams the reply into the chat as it is generated
+                        yield from character_chatbot.chat_stream(message, history, "naruto")
                     
                     gr.ChatInterface(
                         chat_naruto,
@@ -210,7 +277,8 @@ def main():
                 
                 with gr.Tab("Sasuke"):
                     def chat_sasuke(message, history):
-                        return character_chatbot.chat(message, history, "sasuke")
+                        # Streams the reply into the chat as it is generated
+                        yield from character_chatbot.chat_stream(message, history, "sasuke")
                     
                     gr.ChatInterface(
                         chat_sasuke,
@@ -225,7 +293,8 @@ def main():
                 
                 with gr.Tab("Sakura"):
                     def chat_sakura(message, history):
-                        return character_chatbot.chat(message, history, "sakura")
+                        # Streams the reply into the chat as it is generated
+                        yield from character_chatbot.chat_stream(message, history, "sakura")
                     
                     gr.ChatInterface(
                         chat_sakura,
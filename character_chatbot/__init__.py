@@ -1,3 +1,4 @@
 from .character_chatbot import GeminiChatBot
+from .llm_client import LLMClient, CircuitBreaker, CircuitOpenError
 
-__all__ = ['GeminiChatBot']
\ No newline at end of file
+__all__ = ['GeminiChatBot', 'LLMClient', 'CircuitBreaker', 'CircuitOpenError']
@@ -1,85 +1,25 @@
+import math
 import os
-import google.generativeai as genai
+import threading
 from dotenv import load_dotenv
+from .response_cache import ResponseCache
+from .quote_index import CharacterQuoteIndex
+from .llm_client import LLMClient, CircuitBreaker, CircuitOpenError, is_rate_limit_error
 
 load_dotenv()
 
-class GeminiChatBot:
-    def __init__(self):
-        self.api_key = os.getenv('GEMINI_API_KEY')
-        self.available = bool(self.api_key)
-        
-        if self.available:
-            try:
-                genai.configure(api_key=self.api_key)
-                
-                # List available models for debugging
-                try:
-                    available_models = genai.list_models()
-                    print("\nAvailable Gemini models with generateContent support:")
-                    for model in available_models:
-                        if 'generateContent' in model.supported_generation_methods:
-                            print(f"   - {model.name}")
-                    print()  # Empty line for readability
-                except Exception as list_error:
-                    print(f"Could not list models: {list_error}")
-                
-                # Try multiple model names in order of preference
-                # Updated with latest stable model names (2024)
-                model_names = [
-                    'gemini-2.0-flash-exp',      # Newest experimental
-                    'gemini-1.5-flash',          # Latest stable Flash model
-                    'gemini-1.5-pro',            # Latest stable Pro model
-                    'gemini-pro',                # Fallback to older stable
-                ]
-                
-                model_loaded = False
-                print("Trying to load Gemini model...")
-                for model_name in model_names:
-                    try:
-                        print(f"   Attempting: {model_name}...", end=" ")
-                        self.model = genai.GenerativeModel(model_name)
-                        # Test if model is accessible
-                        self.available = True
-                        print(f"SUCCESS!")
-                        print(f"\nChatbot ready with model: {model_name}\n")
-                        model_loaded = True
-                        break
-                    except Exception as model_error:
-                        print(f"Failed")
-                        # Only print full error for debugging if needed
-                        if "404" in str(model_error):
-                            print(f"      (Model not found)")
-                        else:
-                            print(f"      ({str(model_error)[:80]})")
-                        continue
-                
-                if not model_loaded:
-                    print("\n" + "="*60)
-                    print("ERROR: Could not load any Gemini model!")
-                    print("="*60)
-                    print("Solutions:")
-                    print("   1. Check if your API key is valid")
-                    print("   2. Look at the 'Available Gemini models' list above")
-                    print("   3. Update model_names in character_chatbot.py to match")
-                    print("   4. Run: pip install --upgrade google-generativeai")
-                    print("="*60 + "\n")
-                    self.available = False
-                    
-            except Exception as e:
-                print(f"Error configuring Gemini: {e}")
-                self.available = False
-        else:
-            print("Gemini API key not found in .env file")
-    
-    def chat(self, message, history, character="naruto"):
-        if not self.available:
-            return "Gemini chatbot not available. Please check your API key."
-        
-        try:
-            # Enhanced character-specific prompts with detailed personalities
-            character_prompts = {
-                "naruto": """You ARE Naruto Uzumaki. Respond EXACTLY as him:
+# Exchanges of history included in the prompt (and so in the cache key)
+HISTORY_WINDOW = 6
+
+# Speaker-attributed lines from the show; the character's most relevant ones
+# are added to each prompt, within an estimated token budget
+QUOTES_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'naruto.csv')
+QUOTE_TOP_K = 4
+QUOTE_TOKEN_BUDGET = 200
+
+# Enhanced character-specific prompts with detailed personalities
+CHARACTER_PROMPTS = {
+    "naruto": """You ARE Naruto Uzumaki. Respond EXACTLY as him:
 - ORPHAN JINCHURIKI of Nine-Tails, hated by village, dreams of becoming HOKAGE
 - SUPER energetic! Use "DATTEBAYO!", "BELIEVE IT!", lots of EXCLAMATIONS!!
 - Techniques: Shadow Clone Jutsu, Rasengan, Sage Mode, Six Paths Sage Mode
@@ -87,7 +27,7 @@ class GeminiChatBot:
 - Family: Son of Minato & Kushina, Husband to Hinata, Father of Boruto & Himawari
 - NEVER give up! SUPER positive attitude! Loud and passionate!""",
 
-                "sasuke": """You ARE Sasuke Uchiha. Respond EXACTLY as him:
+    "sasuke": """You ARE Sasuke Uchiha. Respond EXACTLY as him:
 - SOLE UCHIHA survivor, clan massacred by brother Itachi, seeks power & redemption
 - COLD, BROODING, minimal words. No emotions. Formal, measured speech.
 - Techniques: Sharingan, Rinnegan, Chidori, Amaterasu, Susanoo
@@ -95,65 +35,298 @@ class GeminiChatBot:
 - Family: Son of Fugaku & Mikoto, Husband to Sakura, Father of Sarada
 - Short, direct responses. No exclamations. Distant and superior tone.""",
 
-                "sakura": """You ARE Sakura Haruno. Respond EXACTLY as her:
+    "sakura": """You ARE Sakura Haruno. Respond EXACTLY as her:
 - MEDICAL NINJA prodigy, trained by Tsunade, overcame insecurity about forehead
 - INTELLIGENT but emotional. Practical yet caring. Blunt but protective.
 - Techniques: Mystical Palm, Creation Rebirth, super strength "SHANNARO!"
 - Talk about: Chakra control, healing, protecting patients, Tsunade's teachings
 - Family: Married Sasuke Uchiha, became Sakura Uchiha, mother of Sarada
 - Balance medical knowledge with emotional depth. Strong-willed determination."""
-            }
-            
-            # Character display names
-            char_display_name = {"naruto": "Naruto", "sasuke": "Sasuke", "sakura": "Sakura"}[character]
-            
-            # Build concise conversation with better formatting
-            conversation_parts = [character_prompts[character]]
-            
-            # Add history efficiently
-            for user_msg, bot_msg in history[-6:]:  # Keep only last 6 exchanges for context
-                conversation_parts.append(f"Human: {user_msg}")
-                conversation_parts.append(f"{char_display_name}: {bot_msg}")
-            
-            conversation_parts.append(f"Human: {message}")
-            conversation_parts.append(f"{char_display_name}:")
+}
+
+# Character display names
+CHARACTER_DISPLAY_NAMES = {"naruto": "Naruto", "sasuke": "Sasuke", "sakura": "Sakura"}
+
+# Character-specific generation settings with increased token limits
+GENERATION_CONFIGS = {
+    "naruto": {"temperature": 0.95, "max_output_tokens": 500, "top_p": 0.9},
+    "sasuke": {"temperature": 0.6, "max_output_tokens": 300, "top_p": 0.8},
+    "sakura": {"temperature": 0.8, "max_output_tokens": 400, "top_p": 0.85}
+}
+
+def get_generation_config(character):
+    # A plain dict: genai.GenerativeModel accepts it like a GenerationConfig, and
+    # stand-in models get a reply without google.generativeai installed
+    return dict(GENERATION_CONFIGS[character])
+
+def get_default_response_cache():
+    disk_path = os.getenv('CHAT_CACHE_PATH') or None
+    return ResponseCache(max_entries=int(os.getenv('CHAT_CACHE_MAX_ENTRIES', 1024)),
+                         ttl_seconds=float(os.getenv('CHAT_CACHE_TTL_SECONDS', 3600)),
+                         disk_path=disk_path)
+
+def get_default_quote_index():
+    csv_path = os.getenv('CHAT_QUOTES_PATH') or QUOTES_CSV_PATH
+    if not os.path.exists(csv_path):
+        return None
+    # Built (or loaded) on the first chat, not at startup
+    return CharacterQuoteIndex(csv_path)
+
+def get_default_llm_client(model):
+    circuit_breaker = CircuitBreaker(failure_threshold=int(os.getenv('LLM_BREAKER_FAILURES', 5)),
+                                     reset_timeout_seconds=float(os.getenv('LLM_BREAKER_RESET_SECONDS', 30)))
+    return LLMClient(model,
+                     max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 4)),
+                     timeout_seconds=float(os.getenv('LLM_TIMEOUT_SECONDS', 30)),
+                     max_retries=int(os.getenv('LLM_MAX_RETRIES', 3)),
+                     circuit_breaker=circuit_breaker)
+
+def get_error_message(error):
+    # What the user sees when a reply could not be generated
+    if isinstance(error, CircuitOpenError):
+        return f"Gemini is having trouble right now. Please try again in {max(1, math.ceil(error.retry_after))} seconds."
+    if isinstance(error, TimeoutError):
+        return "Gemini took too long to answer. Please try again."
+    if is_rate_limit_error(error):
+        return "Gemini is receiving too many requests. Please try again in a moment."
+    return f"Error: {str(error)}"
+
+class GeminiChatBot:
+    def __init__(self, model=None, model_name=None, response_cache=None, use_cache=True, llm_client=None,
+                 quote_index=None, use_quotes=True, quote_token_budget=QUOTE_TOKEN_BUDGET):
+        # Replies are grounded in the character's own lines from the show
+        if use_quotes and quote_index is None:
+            quote_index = get_default_quote_index()
+        self.quote_index = quote_index if use_quotes else None
+        self.quote_token_budget = quote_token_budget
+
+        # Repeated prompts are answered from the cache instead of another API call
+        if use_cache and response_cache is None:
+            response_cache = get_default_response_cache()
+        self.response_cache = response_cache if use_cache else None
+
+        # Any object with generate_content(prompt, generation_config=...) can stand in for Gemini
+        if model is not None:
+            self.api_key = None
+            self.model = model
+            self.model_name = model_name or type(model).__name__
+            self.available = True
+            self.llm_client = llm_client or get_default_llm_client(model)
+            return
+
+        self.api_key = os.getenv('GEMINI_API_KEY')
+        # The Gemini model is built on the first chat (see ensure_model), so
+        # creating the chatbot imports nothing and makes no network calls
+        self.available = bool(self.api_key)
+        self.model = None
+        self.model_name = None
+        self.llm_client = llm_client
+        self.model_lock = threading.Lock()
+        if not self.available:
+            print("Gemini API key not found in .env file")
+
+    def ensure_model(self):
+        # Returns whether a model is ready, building the Gemini model on first use
+        if self.model is not None or not self.available:
+            return self.available
+        with self.model_lock:
+            if self.model is None and self.available:
+                self.load_gemini_model(self.llm_client)
+        return self.available
+
+    def load_gemini_model(self, llm_client=None):
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+
+            # List available models for debugging; a network round trip, so only on request
+            if os.getenv('GEMINI_LIST_MODELS', '0').lower() in ('1', 'true', 'yes'):
+                try:
+                    available_models = genai.list_models()
+                    print("\nAvailable Gemini models with generateContent support:")
+                    for model in available_models:
+                        if 'generateContent' in model.supported_generation_methods:
+                            print(f"   - {model.name}")
+                    print()  # Empty line for readability
+                except Exception as list_error:
+                    print(f"Could not list models: {list_error}")
+
+            # Try multiple model names in order of preference
+            # Updated with latest stable model names (2024)
+            model_names = [
+                'gemini-2.0-flash-exp',      # Newest experimental
+                'gemini-1.5-flash',          # Latest stable Flash model
+                'gemini-1.5-pro',            # Latest stable Pro model
+                'gemini-pro',                # Fallback to older stable
+            ]
+
+            model_loaded = False
+            print("Trying to load Gemini model...")
+            for model_name in model_names:
+                try:
+                    print(f"   Attempting: {model_name}...", end=" ")
+                    model = genai.GenerativeModel(model_name)
+                    self.model_name = model_name
+                    # All calls go through the client: concurrency cap, timeouts, retries
+                    self.llm_client = llm_client or get_default_llm_client(model)
+                    # Set last: other threads take a model as the sign everything is ready
+                    self.model = model
+                    # Test if model is accessible
+                    self.available = True
+                    print(f"SUCCESS!")
+                    print(f"\nChatbot ready with model: {model_name}\n")
+                    model_loaded = True
+                    break
+                except Exception as model_error:
+                    print(f"Failed")
+                    # Only print full error for debugging if needed
+                    if "404" in str(model_error):
+                        print(f"      (Model not found)")
+                    else:
+                        print(f"      ({str(model_error)[:80]})")
+                    continue
+
+            if not model_loaded:
+                print("\n" + "="*60)
+                print("ERROR: Could not load any Gemini model!")
+                print("="*60)
+                print("Solutions:")
+                print("   1. Check if your API key is valid")
+                print("   2. Run with GEMINI_LIST_MODELS=1 to list the available Gemini models")
+                print("   3. Update model_names in character_chatbot.py to match")
+                print("   4. Run: pip install --upgrade google-generativeai")
+                print("="*60 + "\n")
+                self.available = False
+
+        except Exception as e:
+            print(f"Error configuring Gemini: {e}")
+            self.available = False
+
+    def get_quotes(self, message, character):
+        if self.quote_index is None:
+            return []
+        try:
+            return self.quote_index.get_quotes(character, message, k=QUOTE_TOP_K, token_budget=self.quote_token_budget)
+        except Exception as e:
+            # Retrieval only adds context; a broken index must not stop the chat
+            print(f"Could not retrieve quotes: {e}")
+            return []
+
+    def build_conversation(self, message, history, character):
+        char_display_name = CHARACTER_DISPLAY_NAMES[character]
+
+        # Build concise conversation with better formatting
+        conversation_parts = [CHARACTER_PROMPTS[character]]
+
+        quotes = self.get_quotes(message, character)
+        if quotes:
+            conversation_parts.append("Things you have actually said, for your voice (don't repeat them word for word):\n"
+                                      + "\n".join(f'- "{quote}"' for quote in quotes))
+        
+        # Add history efficiently
+        for user_msg, bot_msg in history[-HISTORY_WINDOW:]:  # Keep only last 6 exchanges for context
+            conversation_parts.append(f"Human: {user_msg}")
+            conversation_parts.append(f"{char_display_name}: {bot_msg}")
+        
+        conversation_parts.append(f"Human: {message}")
+        conversation_parts.append(f"{char_display_name}:")
+        
+        return "\n".join(conversation_parts)
+
+    def postprocess_response(self, response_text, character):
+        # Clean and enhance response
+        response_text = response_text.strip()
+        
+        # Character-specific response enhancements (less aggressive)
+        if character == "naruto":
+            if not any(x in response_text.lower() for x in ['dattebayo', 'believe it']):
+                if len(response_text) < 100:
+                    response_text += " Believe it, dattebayo!"
+                else:
+                    # Add to the end if it's a longer response
+                    response_text = response_text.rstrip('.!') + "! Believe it, dattebayo!"
             
-            conversation = "\n".join(conversation_parts)
+        elif character == "sasuke":
+            # Don't truncate Sasuke's responses - let him speak
+            response_text = response_text.replace('Hmm', 'Hn.')
             
-            # Character-specific generation settings with increased token limits
-            generation_config = {
-                "naruto": {"temperature": 0.95, "max_output_tokens": 500, "top_p": 0.9},
-                "sasuke": {"temperature": 0.6, "max_output_tokens": 300, "top_p": 0.8},
-                "sakura": {"temperature": 0.8, "max_output_tokens": 400, "top_p": 0.85}
-            }[character]
+        elif character == "sakura":
+            if 'strength' in response_text.lower() and 'shannaro' not in response_text.lower():
+                if len(response_text.split()) < 30:  # Only for shorter responses
+                    response_text = response_text.rstrip('.!') + ' SHANNARO!'
+
+        return response_text
+
+    def get_cached_response(self, message, history, character):
+        # Returns (cache_key, cached reply or None); the key is None without a cache
+        if self.response_cache is None:
+            return None, None
+        cache_key = self.response_cache.get_key(self.model_name, character, message, history, HISTORY_WINDOW)
+        return cache_key, self.response_cache.get(cache_key)
+
+    def chat(self, message, history, character="naruto"):
+        if not self.ensure_model():
+            return "Gemini chatbot not available. Please check your API key."
+
+        cache_key, cached_response = self.get_cached_response(message, history, character)
+        if cached_response is not None:
+            return cached_response
+        
+        try:
+            conversation = self.build_conversation(message, history, character)
             
-            response = self.model.generate_content(
+            response = self.llm_client.generate(
                 conversation,
-                generation_config=genai.types.GenerationConfig(**generation_config)
+                generation_config=get_generation_config(character)
             )
             
-            # Clean and enhance response
-            response_text = response.text.strip()
-            
-            # Character-specific response enhancements (less aggressive)
-            if character == "naruto":
-                if not any(x in response_text.lower() for x in ['dattebayo', 'believe it']):
-                    if len(response_text) < 100:
-                        response_text += " Believe it, dattebayo!"
-                    else:
-                        # Add to the end if it's a longer response
-                        response_text = response_text.rstrip('.!') + "! Believe it, dattebayo!"
-                
-            elif character == "sasuke":
-                # Don't truncate Sasuke's responses - let him speak
-                response_text = response_text.replace('Hmm', 'Hn.')
-                
-            elif character == "sakura":
-                if 'strength' in response_text.lower() and 'shannaro' not in response_text.lower():
-                    if len(response_text.split()) < 30:  # Only for shorter responses
-                        response_text = response_text.rstrip('.!') + ' SHANNARO!'
-            
+            response_text = self.postprocess_response(response.text, character)
+
+            # Only successful replies are cached; errors are retried next time
+            if cache_key is not None:
+                self.response_cache.set(cache_key, response_text)
             return response_text
             
         except Exception as e:
-            return f"Error: {str(e)}"
\ No newline at end of file
+            return get_error_message(e)
+
+    def chat_stream(self, message, history, character="naruto"):
+        # Generator for gr.ChatInterface: yields the reply so far as chunks
+        # arrive, then the post-processed reply once the stream ends
+        if not self.ensure_model():
+            yield "Gemini chatbot not available. Please check your API key."
+            return
+
+        cache_key, cached_response = self.get_cached_response(message, history, character)
+        if cached_response is not None:
+            yield cached_response
+            return
+
+        response_text = ""
+        try:
+            conversation = self.build_conversation(message, history, character)
+
+            response = self.llm_client.stream(
+                conversation,
+                generation_config=get_generation_config(character)
+            )
+
+            for chunk in response:
+                try:
+                    chunk_text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only a finish reason)
+                    continue
+                response_text += chunk_text
+                # Sasuke's replacement is safe to apply as text arrives; the
+                # endings for Naruto and Sakura depend on the whole reply
+                yield response_text.replace('Hmm', 'Hn.') if character == "sasuke" else response_text
+
+            response_text = self.postprocess_response(response_text, character)
+            yield response_text
+
+            if cache_key is not None:
+                self.response_cache.set(cache_key, response_text)
+
+        except Exception as e:
+            yield f"{response_text}\n\n{get_error_message(e)}" if response_text else get_error_message(e)
@@ -0,0 +1,134 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Error bodies shaped like the Gemini REST API's
+ERROR_STATUSES = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    # POST /v1beta/models/<model>:generateContent and :streamGenerateContent?alt=sse.
+    # How the server behaves (latency, rate limits, outages) is read from
+    # server.behaviour on every request, so a run can change it as it goes.
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.stats['requests'] += 1
+            server.active += 1
+            server.stats['max_concurrent'] = max(server.stats['max_concurrent'], server.active)
+            behaviour = dict(server.behaviour)
+            draw = server.rng.random()
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+            prompt = body['contents'][0]['parts'][0]['text']
+
+            status = behaviour['status']
+            if status == 200 and draw < behaviour['rate_limit_rate']:
+                status = 429
+            if status != 200:
+                time.sleep(behaviour['error_latency_ms'] / 1000)
+                self.send_error_body(status)
+                return
+
+            question = prompt.rsplit("Human: ", 1)[-1].split("\n")[0]
+            words = f"Fake reply to: {question}. Hmm, believe it!".split(" ")
+            if ':streamGenerateContent' in self.path:
+                self.send_stream(words, behaviour)
+            else:
+                time.sleep(behaviour['latency_ms'] / 1000)
+                self.send_json(200, self.get_candidate(" ".join(words)))
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def get_candidate(self, text):
+        return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}]}
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_body(self, status):
+        with self.server.lock:
+            self.server.stats[f'status_{status}'] = self.server.stats.get(f'status_{status}', 0) + 1
+        self.send_json(status, {'error': {'code': status, 'message': f"Fake upstream error {status}",
+                                          'status': ERROR_STATUSES.get(status, "UNKNOWN")}})
+
+    def send_stream(self, words, behaviour):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        num_chunks = max(1, behaviour['chunks'])
+        size = -(-len(words) // num_chunks)
+        for index in range(0, len(words), size):
+            time.sleep(behaviour['latency_ms'] / 1000 / num_chunks)
+            text = " ".join(words[index:index+size]) + " "
+            self.wfile.write(b"data: " + json.dumps(self.get_candidate(text)).encode('utf-8') + b"\n\n")
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_fake_gemini(port=0, seed=0, **behaviour):
+    # Returns a running server on a background thread; server.server_port holds the port
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.rng = random.Random(seed)
+    server.active = 0
+    server.stats = {'requests': 0, 'max_concurrent': 0}
+    server.behaviour = {'latency_ms': 200, 'error_latency_ms': 20, 'chunks': 4,
+                        'rate_limit_rate': 0.0, 'status': 200}
+    server.behaviour.update(behaviour)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class FakeGeminiError(Exception):
+    # Carries the HTTP status as .code, like google.api_core's exceptions
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+class FakeGeminiResponse():
+    def __init__(self, payload):
+        self.text = "".join(part.get('text', "") for candidate in payload.get('candidates', [])
+                            for part in candidate['content']['parts'])
+
+class FakeGeminiModel():
+    # Talks to serve_fake_gemini() over HTTP with the generate_content()
+    # signature GeminiChatBot uses, so requests go through a real socket
+    def __init__(self, base_url, model_name="fake-gemini", socket_timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.model_name = model_name
+        self.socket_timeout = socket_timeout
+
+    def post(self, method, prompt, generation_config):
+        url = f"{self.base_url}/v1beta/models/{self.model_name}:{method}"
+        # The fake server ignores generation settings, so they are not sent
+        payload = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            return urllib.request.urlopen(request, timeout=self.socket_timeout)
+        except urllib.error.HTTPError as e:
+            error = json.loads(e.read() or b"{}").get('error', {})
+            raise FakeGeminiError(e.code, error.get('message', e.reason)) from None
+
+    def read_stream(self, response):
+        with response:
+            for line in response:
+                if line.startswith(b"data: "):
+                    yield FakeGeminiResponse(json.loads(line[len(b"data: "):]))
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        if stream:
+            return self.read_stream(self.post('streamGenerateContent?alt=sse', prompt, generation_config))
+        with self.post('generateContent', prompt, generation_config) as response:
+            return FakeGeminiResponse(json.loads(response.read()))
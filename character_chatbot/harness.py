@@ -0,0 +1,281 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .character_chatbot import GeminiChatBot, QUOTES_CSV_PATH
+from .fake_server import FakeGeminiModel, serve_fake_gemini
+from .llm_client import CircuitBreaker, LLMClient
+from .quote_index import CharacterQuoteIndex, estimate_tokens
+from .response_cache import ResponseCache
+
+EXAMPLE_PROMPTS = {
+    "naruto": ["What's your dream?", "Tell me about your abilities", "Who is your sensei?", "What's your strongest technique?"],
+    "sasuke": ["What is your goal?", "Tell me about the Uchiha clan", "Why do you seek power?", "What is the Sharingan?"],
+    "sakura": ["What medical jutsu do you know?", "How did you train with Tsunade?", "What is chakra control?", "Tell me about your strength"],
+}
+
+class StandInResponse():
+    def __init__(self, text):
+        self.text = text
+
+class StandInModel():
+    # Local replacement for genai.GenerativeModel: canned replies generated in
+    # num_chunks steps over latency_ms, and a count of the calls that would
+    # have used API quota. stream=True yields the chunks as they are "generated".
+    def __init__(self, latency_ms=400, num_chunks=8):
+        self.latency = latency_ms / 1000
+        self.num_chunks = num_chunks
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_chunks(self, prompt):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        question = prompt.rsplit("Human: ", 1)[-1].split("\n")[0]
+        words = f"(reply #{call}) You asked: {question}. Hmm, that is a question I hear a lot on my travels".split(" ")
+        size = -(-len(words) // self.num_chunks)
+        return [" ".join(words[index:index+size]) + " " for index in range(0, len(words), size)]
+
+    def stream_chunks(self, chunks):
+        for chunk in chunks:
+            time.sleep(self.latency / len(chunks))
+            yield StandInResponse(chunk)
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        chunks = self.get_chunks(prompt)
+        if stream:
+            return self.stream_chunks(chunks)
+        time.sleep(self.latency)
+        return StandInResponse("".join(chunks))
+
+def format_percentile(values, percentile, scale, width, precision=1):
+    # "n/a" when there are no samples (e.g. every request in a phase failed)
+    # instead of numpy's error on an empty array
+    if len(values) == 0:
+        return "n/a".rjust(width)
+    return f"{np.percentile(values, percentile) * scale:{width}.{precision}f}"
+
+def time_chat(chatbot, message, history, character):
+    start_time = time.perf_counter()
+    response = chatbot.chat(message, history, character)
+    return response, time.perf_counter() - start_time
+
+def run(rounds=5, latency_ms=400, disk=False):
+    model = StandInModel(latency_ms=latency_ms)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        disk_path = os.path.join(cache_dir, 'chat_cache.sqlite') if disk else None
+        chatbot = GeminiChatBot(model=model, model_name="stand-in",
+                                response_cache=ResponseCache(max_entries=256, ttl_seconds=600, disk_path=disk_path))
+
+        miss_latencies = []
+        hit_latencies = []
+        for round_index in range(rounds):
+            for character, prompts in EXAMPLE_PROMPTS.items():
+                for prompt in prompts:
+                    # Later rounds vary case and spacing, as users retyping the examples do
+                    message = prompt if round_index % 2 == 0 else f"  {prompt.lower()} "
+                    calls_before = model.calls
+                    _, elapsed = time_chat(chatbot, message, [], character)
+                    (miss_latencies if model.calls > calls_before else hit_latencies).append(elapsed)
+
+        # Same question with a different conversation so far is a different prompt
+        history = [("Hi", "Hey! Believe it, dattebayo!")]
+        calls_before = model.calls
+        chatbot.chat("What's your dream?", history, "naruto")
+        history_is_part_of_key = model.calls == calls_before + 1
+
+        requests = rounds * sum(len(prompts) for prompts in EXAMPLE_PROMPTS.values())
+        print(f"{requests} chat requests, {model.calls - 1} model calls ({requests - model.calls + 1} saved)")
+        print(f"   uncached  p50 {format_percentile(miss_latencies, 50, 1000, 9, 3)} ms")
+        print(f"   cached    p50 {format_percentile(hit_latencies, 50, 1e6, 9)} us   p99 {format_percentile(hit_latencies, 99, 1e6, 9)} us")
+        print(f"   history is part of the key: {history_is_part_of_key}")
+        print(f"   cache stats: {chatbot.response_cache.get_stats()}")
+
+        if disk:
+            # A fresh process would start with an empty memory cache but the same file
+            restarted = GeminiChatBot(model=model, model_name="stand-in",
+                                      response_cache=ResponseCache(max_entries=256, ttl_seconds=600, disk_path=disk_path))
+            calls_before = model.calls
+            restarted.chat("What is the Sharingan?", [], "sasuke")
+            print(f"   answered from disk after restart: {model.calls == calls_before}")
+
+def run_streaming(requests=20, latency_ms=400, num_chunks=8):
+    # Time to the first visible text: blocking chat() vs chat_stream()
+    model = StandInModel(latency_ms=latency_ms, num_chunks=num_chunks)
+    chatbot = GeminiChatBot(model=model, model_name="stand-in", use_cache=False)
+
+    rows = []
+    for index in range(requests):
+        character = list(EXAMPLE_PROMPTS)[index % len(EXAMPLE_PROMPTS)]
+        prompts = EXAMPLE_PROMPTS[character]
+        message = prompts[index % len(prompts)]
+
+        start_time = time.perf_counter()
+        blocking_reply = chatbot.chat(message, [], character)
+        blocking_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        first_chunk_seconds = None
+        num_updates = 0
+        for streamed_reply in chatbot.chat_stream(message, [], character):
+            if first_chunk_seconds is None:
+                first_chunk_seconds = time.perf_counter() - start_time
+            num_updates += 1
+        stream_seconds = time.perf_counter() - start_time
+
+        # The stand-in numbers its replies, so compare with the number taken out
+        final_matches = streamed_reply == chatbot.postprocess_response(
+            blocking_reply.replace(f"#{model.calls - 1})", f"#{model.calls})"), character)
+        rows.append((blocking_seconds, first_chunk_seconds, stream_seconds, num_updates, final_matches))
+
+    blocking, first_chunk, total, updates, matches = (np.array(column) for column in zip(*rows))
+    print(f"{requests} replies, {num_chunks} chunks over {latency_ms:.0f} ms each")
+    print(f"   blocking chat()     first text p50 {format_percentile(blocking, 50, 1000, 8)} ms")
+    print(f"   chat_stream()       first text p50 {format_percentile(first_chunk, 50, 1000, 8)} ms   "
+          f"complete p50 {format_percentile(total, 50, 1000, 8)} ms   {updates.mean():.1f} updates/reply")
+    print(f"   final streamed reply post-processed like chat(): {bool(matches.all())}")
+
+def run_client_phase(chatbot, name, requests, users, stream=False):
+    # `users` Gradio worker threads send `requests` chats at once
+    def send(index):
+        character = list(EXAMPLE_PROMPTS)[index % len(EXAMPLE_PROMPTS)]
+        message = f"{EXAMPLE_PROMPTS[character][index % 4]} ({name} {index})"
+        start_time = time.perf_counter()
+        if stream:
+            for reply in chatbot.chat_stream(message, [], character):
+                pass
+        else:
+            reply = chatbot.chat(message, [], character)
+        return reply, time.perf_counter() - start_time
+
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        results = list(executor.map(send, range(requests)))
+    replies = [reply for reply, _ in results]
+    latencies = np.array([elapsed for _, elapsed in results]) * 1000
+    answered = sum(reply.startswith("Fake reply") for reply in replies)
+    print(f"   {name:<12} {answered:3d}/{requests} answered   p50 {format_percentile(latencies, 50, 1, 7)} ms   "
+          f"p99 {format_percentile(latencies, 99, 1, 7)} ms")
+    for reply in sorted(set(reply for reply in replies if not reply.startswith("Fake reply")))[:2]:
+        print(f"      {reply[:100]}")
+
+def run_client(requests=48, users=32, max_concurrency=4, timeout_ms=600, latency_ms=200):
+    # LLMClient against the local fake Gemini server, through healthy,
+    # rate-limited, down and recovered phases
+    server = serve_fake_gemini(latency_ms=latency_ms)
+    model = FakeGeminiModel(f"http://127.0.0.1:{server.server_port}")
+    llm_client = LLMClient(model, max_concurrency=max_concurrency, timeout_seconds=timeout_ms / 1000,
+                           max_retries=3, backoff_seconds=0.05, max_backoff_seconds=0.5,
+                           circuit_breaker=CircuitBreaker(failure_threshold=5, reset_timeout_seconds=1))
+    chatbot = GeminiChatBot(model=model, model_name="fake-gemini", use_cache=False, llm_client=llm_client)
+
+    print(f"{requests} chats from {users} users per phase, at most {max_concurrency} model calls at once")
+    run_client_phase(chatbot, "healthy", requests, users)
+    run_client_phase(chatbot, "streaming", requests, users, stream=True)
+    server.behaviour['rate_limit_rate'] = 0.3
+    run_client_phase(chatbot, "rate-limited", requests, users)
+    server.behaviour.update(rate_limit_rate=0.0, latency_ms=timeout_ms * 2)
+    run_client_phase(chatbot, "slow", max_concurrency * 2, users)
+
+    # Wait out the open circuit and the abandoned slow calls before each phase
+    pause = llm_client.circuit_breaker.reset_timeout_seconds + timeout_ms * 2 / 1000
+    time.sleep(pause)
+    server.behaviour.update(latency_ms=latency_ms, status=503)
+    requests_before = server.stats['requests']
+    run_client_phase(chatbot, "down", requests, users)
+    print(f"      model calls while down: {server.stats['requests'] - requests_before}, "
+          f"circuit {llm_client.circuit_breaker.get_state()}")
+
+    server.behaviour['status'] = 200
+    time.sleep(pause)
+    # The half-open circuit lets a single trial call through, which closes it
+    run_client_phase(chatbot, "trial", 1, 1)
+    run_client_phase(chatbot, "recovered", requests, users)
+
+    stats = llm_client.get_stats()
+    print(f"   server: {server.stats}")
+    print(f"   client: {stats}")
+    print(f"   concurrency cap held: {server.stats['max_concurrent'] <= max_concurrency}")
+    llm_client.close()
+    server.shutdown()
+
+def run_quotes(csv_path=QUOTES_CSV_PATH, repeat=2000, token_budget=200):
+    # Build and load times of the quote index, retrieval latency, and what it adds to the prompt
+    with tempfile.TemporaryDirectory() as index_dir:
+        index_path = os.path.join(index_dir, 'quotes')
+        start_time = time.perf_counter()
+        CharacterQuoteIndex(csv_path, index_path).get_partitions()
+        build_seconds = time.perf_counter() - start_time
+
+        # A fresh process finds the index on disk and only memory-maps it
+        quote_index = CharacterQuoteIndex(csv_path, index_path)
+        start_time = time.perf_counter()
+        quote_index.get_partitions()
+        load_seconds = time.perf_counter() - start_time
+        print(f"quote index over {os.path.basename(csv_path)}: build {build_seconds*1000:.1f} ms, "
+              f"load {load_seconds*1000:.2f} ms")
+
+        chatbot = GeminiChatBot(model=StandInModel(latency_ms=0), model_name="stand-in", use_cache=False,
+                                quote_index=quote_index, quote_token_budget=token_budget)
+        plain_chatbot = GeminiChatBot(model=StandInModel(latency_ms=0), model_name="stand-in", use_cache=False,
+                                      use_quotes=False)
+        stats = quote_index.get_stats()
+        for character, prompts in EXAMPLE_PROMPTS.items():
+            latencies = []
+            for _ in range(repeat):
+                for prompt in prompts:
+                    start_time = time.perf_counter()
+                    chatbot.get_quotes(prompt, character)
+                    latencies.append(time.perf_counter() - start_time)
+
+            added_tokens = [estimate_tokens(chatbot.build_conversation(prompt, [], character))
+                            - estimate_tokens(plain_chatbot.build_conversation(prompt, [], character))
+                            for prompt in prompts]
+            print(f"   {character:<7} {stats.get(character, {}).get('quotes', 0):3d} lines   retrieval "
+                  f"p50 {format_percentile(latencies, 50, 1e6, 6)} us   p99 {format_percentile(latencies, 99, 1e6, 6)} us   "
+                  f"prompt +{max(added_tokens)} tokens at most (budget {token_budget})")
+            for prompt in prompts:
+                quotes = chatbot.get_quotes(prompt, character)
+                if quotes:
+                    print(f"      {prompt!r} -> {quotes[0][:80]!r}")
+                    break
+
+def main():
+    parser = argparse.ArgumentParser(description="GeminiChatBot against a local stand-in model")
+    subparsers = parser.add_subparsers(dest='harness', required=True)
+
+    cache = subparsers.add_parser('cache', help="response cache hits, latency and saved model calls")
+    cache.add_argument('--rounds', type=int, default=5)
+    cache.add_argument('--latency-ms', type=float, default=400)
+    cache.add_argument('--disk', action='store_true', help="back the cache with SQLite")
+    cache.set_defaults(run=lambda args: run(args.rounds, args.latency_ms, args.disk))
+
+    streaming = subparsers.add_parser('streaming', help="first-chunk latency of chat_stream vs chat")
+    streaming.add_argument('--requests', type=int, default=20)
+    streaming.add_argument('--latency-ms', type=float, default=400)
+    streaming.add_argument('--chunks', type=int, default=8)
+    streaming.set_defaults(run=lambda args: run_streaming(args.requests, args.latency_ms, args.chunks))
+
+    client = subparsers.add_parser('client', help="LLMClient against a local fake Gemini server")
+    client.add_argument('--requests', type=int, default=48)
+    client.add_argument('--users', type=int, default=32)
+    client.add_argument('--max-concurrency', type=int, default=4)
+    client.add_argument('--timeout-ms', type=float, default=600)
+    client.add_argument('--latency-ms', type=float, default=200)
+    client.set_defaults(run=lambda args: run_client(args.requests, args.users, args.max_concurrency,
+                                                    args.timeout_ms, args.latency_ms))
+
+    quotes = subparsers.add_parser('quotes', help="quote index build, retrieval latency and prompt size")
+    quotes.add_argument('--csv-path', default=QUOTES_CSV_PATH)
+    quotes.add_argument('--repeat', type=int, default=2000)
+    quotes.add_argument('--token-budget', type=int, default=200)
+    quotes.set_defaults(run=lambda args: run_quotes(args.csv_path, args.repeat, args.token_budget))
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
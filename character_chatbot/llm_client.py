@@ -0,0 +1,349 @@
+import asyncio
+import functools
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from concurrent.futures import ThreadPoolExecutor
+
+# HTTP statuses a later attempt may get past: rate limits and a briefly unavailable upstream
+RATE_LIMIT_STATUS = 429
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# google.api_core raises ResourceExhausted (code 429); other clients only say it in the message
+RATE_LIMIT_MARKERS = ("429", "resource exhausted", "resourceexhausted", "rate limit", "quota")
+STREAM_END = object()
+
+class CircuitOpenError(RuntimeError):
+    # Raised without calling the model while the circuit breaker is open
+    def __init__(self, retry_after):
+        super().__init__(f"The model is failing, calls are paused for {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def get_status_code(error):
+    code = getattr(error, 'code', None)
+    if code is None:
+        code = getattr(error, 'status_code', None)
+    return code if isinstance(code, int) else None
+
+def is_rate_limit_error(error):
+    if get_status_code(error) == RATE_LIMIT_STATUS:
+        return True
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+def is_retryable_error(error):
+    return (isinstance(error, (TimeoutError, ConnectionError))
+            or is_rate_limit_error(error)
+            or get_status_code(error) in RETRYABLE_STATUSES)
+
+def get_percentile(values, percentile):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+class CircuitBreaker():
+    # Closed: calls go through. After failure_threshold consecutive failures it
+    # opens and calls fail fast for reset_timeout_seconds; then one trial call
+    # is let through (half-open), and its outcome closes or re-opens it.
+    def __init__(self, failure_threshold=5, reset_timeout_seconds=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def get_retry_after(self):
+        with self.lock:
+            if self.state != 'open':
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout_seconds - self.clock())
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'open':
+                if self.clock() - self.opened_at < self.reset_timeout_seconds:
+                    self.stats['rejected'] += 1
+                    return False
+                self.state = 'half_open'
+                self.trial_in_flight = False
+
+            if self.state == 'half_open':
+                if self.trial_in_flight:
+                    self.stats['rejected'] += 1
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_neutral(self):
+        # A call that says nothing about the model's health (e.g. a blocked
+        # prompt). It counts as a success only while closed; a half-open circuit
+        # stays half-open and the next call becomes its trial.
+        with self.lock:
+            if self.state == 'closed':
+                self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened_at = self.clock()
+                self.stats['opened'] += 1
+
+    def get_state(self):
+        with self.lock:
+            return self.state
+
+class LLMClient():
+    # Runs the model's blocking generate_content() calls from an asyncio event
+    # loop on a background thread. At most max_concurrency calls reach the
+    # model at once; the rest wait in line (queue_depth). Every call (and every
+    # streamed chunk) has a timeout, failures a later attempt may get past
+    # (rate limits, 5xx, timeouts) are retried with jittered exponential
+    # backoff, and the circuit breaker fails fast while the model keeps failing.
+    # generate() and stream() block, for Gradio's worker threads;
+    # generate_async() and stream_async() run on the client's loop.
+    def __init__(self, model, max_concurrency=4, timeout_seconds=30, max_retries=3,
+                 backoff_seconds=0.5, max_backoff_seconds=8, circuit_breaker=None,
+                 latency_window=1000, rng=None):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.rng = rng or random.Random()
+
+        # One worker per slot: a call that timed out keeps its worker (and its
+        # slot) until generate_content() returns, so stuck calls can't pile up
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-call")
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.queue_waits = deque(maxlen=latency_window)
+        self.stats = {'requests': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'rate_limited': 0,
+                      'timeouts': 0, 'upstream_errors': 0, 'rejected': 0, 'abandoned_calls': 0,
+                      'max_queue_depth': 0}
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever, name="llm-client", daemon=True)
+                self.thread.start()
+
+    def close(self):
+        with self.lock:
+            if self.thread is not None:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.thread.join()
+                self.loop.close()
+                self.thread = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    async def acquire_slot(self):
+        if not self.circuit_breaker.allow():
+            self.count('rejected')
+            raise CircuitOpenError(self.circuit_breaker.get_retry_after())
+
+        start_time = time.perf_counter()
+        with self.lock:
+            self.queue_depth += 1
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], self.queue_depth)
+        try:
+            await self.semaphore.acquire()
+        finally:
+            with self.lock:
+                self.queue_depth -= 1
+        with self.lock:
+            self.in_flight += 1
+            self.queue_waits.append(time.perf_counter() - start_time)
+
+    def free_slot(self, future=None):
+        if future is not None and not future.cancelled():
+            # Retrieve the abandoned call's outcome so asyncio doesn't log it as unhandled
+            future.exception()
+        with self.lock:
+            self.in_flight -= 1
+        self.semaphore.release()
+
+    def release_slot(self, future):
+        if future is not None and not future.done():
+            self.count('abandoned_calls')
+            future.add_done_callback(self.free_slot)
+        else:
+            self.free_slot()
+
+    def run_model_call(self, function, *args, **kwargs):
+        return asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    async def wait(self, future):
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout_seconds)
+        except TimeoutError:
+            raise TimeoutError(f"No response from the model within {self.timeout_seconds:g}s") from None
+
+    async def attempt_generate(self, prompt, generation_config):
+        await self.acquire_slot()
+        future = None
+        try:
+            future = self.run_model_call(self.model.generate_content, prompt, generation_config=generation_config)
+            return await self.wait(future)
+        finally:
+            self.release_slot(future)
+
+    async def attempt_stream(self, prompt, generation_config):
+        # The slot is held until the stream ends; the timeout applies to each chunk
+        await self.acquire_slot()
+        future = None
+        try:
+            future = self.run_model_call(self.model.generate_content, prompt,
+                                         generation_config=generation_config, stream=True)
+            chunks = iter(await self.wait(future))
+            while True:
+                future = self.run_model_call(next, chunks, STREAM_END)
+                chunk = await self.wait(future)
+                if chunk is STREAM_END:
+                    return
+                yield chunk
+        finally:
+            self.release_slot(future)
+
+    def get_backoff(self, attempt):
+        # "Full jitter": spreads out retries of callers that were rate limited together
+        return self.rng.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    def handle_failure(self, error, attempt):
+        # Returns True when the call should be retried
+        if not is_retryable_error(error):
+            # The model answered (e.g. a blocked prompt); not a sign it is unhealthy,
+            # but not proof it recovered either
+            self.circuit_breaker.record_neutral()
+            self.count('failures')
+            return False
+
+        self.circuit_breaker.record_failure()
+        if is_rate_limit_error(error):
+            self.count('rate_limited')
+        elif isinstance(error, TimeoutError):
+            self.count('timeouts')
+        else:
+            self.count('upstream_errors')
+
+        if attempt >= self.max_retries:
+            self.count('failures')
+            return False
+        self.count('retries')
+        return True
+
+    def record_success(self, start_time):
+        self.circuit_breaker.record_success()
+        with self.lock:
+            self.stats['successes'] += 1
+            self.latencies.append(time.perf_counter() - start_time)
+
+    async def generate_async(self, prompt, generation_config=None):
+        self.count('requests')
+        start_time = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.attempt_generate(prompt, generation_config)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if not self.handle_failure(e, attempt):
+                    raise
+                await asyncio.sleep(self.get_backoff(attempt))
+                continue
+            self.record_success(start_time)
+            return response
+
+    async def stream_async(self, prompt, generation_config=None):
+        # Retried like generate_async() until the first chunk arrives; after
+        # that an error ends the stream, as part of the reply is already shown
+        self.count('requests')
+        start_time = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            received = False
+            try:
+                async with aclosing(self.attempt_stream(prompt, generation_config)) as chunks:
+                    async for chunk in chunks:
+                        received = True
+                        yield chunk
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if not self.handle_failure(e, self.max_retries if received else attempt):
+                    raise
+                await asyncio.sleep(self.get_backoff(attempt))
+                continue
+            self.record_success(start_time)
+            return
+
+    def generate(self, prompt, generation_config=None):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.generate_async(prompt, generation_config), self.loop).result()
+
+    def stream(self, prompt, generation_config=None):
+        # Blocking generator over stream_async(); chunks cross threads through a queue
+        self.start()
+        chunks = queue.Queue()
+
+        async def forward_chunks():
+            try:
+                async for chunk in self.stream_async(prompt, generation_config):
+                    chunks.put((chunk, None))
+                chunks.put((STREAM_END, None))
+            except Exception as e:
+                chunks.put((None, e))
+
+        task = asyncio.run_coroutine_threadsafe(forward_chunks(), self.loop)
+        try:
+            while True:
+                chunk, error = chunks.get()
+                if error is not None:
+                    raise error
+                if chunk is STREAM_END:
+                    return
+                yield chunk
+        finally:
+            # Stops the model call when the caller stops reading early
+            task.cancel()
+
+    def get_stats(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            queue_waits = list(self.queue_waits)
+            stats = dict(self.stats, queue_depth=self.queue_depth, in_flight=self.in_flight)
+        stats['circuit_state'] = self.circuit_breaker.get_state()
+        stats['circuit_opened'] = self.circuit_breaker.stats['opened']
+        for name, values in (('latency', latencies), ('queue_wait', queue_waits)):
+            for percentile in (50, 95, 99):
+                value = get_percentile(values, percentile)
+                stats[f'{name}_p{percentile}_ms'] = None if value is None else round(value * 1000, 1)
+        return stats
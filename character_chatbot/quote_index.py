@@ -0,0 +1,238 @@
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import pathlib
+import threading
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+folder_path = pathlib.Path(__file__).parent.resolve()
+sys.path.append(os.path.join(folder_path, '../'))
+from utils.columnar_store import encode_strings, decode_strings
+
+# Bump when the layout, tokenizer or scoring changes; the index is then rebuilt from the CSV
+QUOTE_INDEX_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Rough prompt-token estimate used for the budget; no tokenizer needed
+CHARS_PER_TOKEN = 4
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# "(Laughing)", "(Shows the stone faces...)": stage directions, not speech
+STAGE_DIRECTION_PATTERN = re.compile(r"\([^)]*\)")
+STOPWORDS = frozenset("""
+    a about am an and are as at be been but by can did do does for from had has have he her him his how i if in is it its
+    just me my no not of on or our s she so t that the their them then there they this to up us was we
+    were what when where who why will with you your ll re ve d m
+""".split())
+
+def quote_index_path_for(csv_path):
+    # data/naruto.csv -> data/naruto.quotes/
+    return os.path.splitext(str(csv_path))[0] + '.quotes'
+
+def get_character_key(name):
+    # "Naruto" and "Naruto Clone" are both Naruto's lines
+    words = TOKEN_PATTERN.findall(str(name).casefold())
+    return words[0] if words else None
+
+def clean_line(line):
+    return " ".join(STAGE_DIRECTION_PATTERN.sub(" ", str(line)).split())
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.casefold()) if token not in STOPWORDS]
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+def build_character_arrays(quotes):
+    # BM25 weight of every (term, quote) pair, grouped by term
+    documents = [Counter(tokenize(quote)) for quote in quotes]
+    lengths = np.array([sum(counts.values()) for counts in documents], dtype=np.float64)
+    average_length = lengths.mean()
+
+    postings = {}
+    for quote_id, counts in enumerate(documents):
+        for term, frequency in counts.items():
+            postings.setdefault(term, []).append((quote_id, frequency))
+
+    vocab = sorted(postings)
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    quote_ids = []
+    weights = []
+    for term_id, term in enumerate(vocab):
+        term_postings = postings[term]
+        idf = math.log(1 + (len(quotes) - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+        for quote_id, frequency in term_postings:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[quote_id] / average_length)
+            quote_ids.append(quote_id)
+            weights.append(idf * frequency * (BM25_K1 + 1) / (frequency + norm))
+        offsets[term_id + 1] = len(quote_ids)
+
+    return {
+        'vocab': vocab,
+        'postings.offsets': offsets,
+        'postings.quotes': np.array(quote_ids, dtype=np.int32),
+        'postings.weights': np.array(weights, dtype=np.float32),
+        'quotes.tokens': np.array([estimate_tokens(quote) for quote in quotes], dtype=np.int32),
+    }
+
+class CharacterQuoteIndex():
+    # BM25 over each character's own lines in data/naruto.csv, for grounding
+    # chat replies in things the character actually said. Built once into a
+    # directory of .npy files next to the CSV, memory-mapped on load, and
+    # rebuilt when the CSV changes. One directory per character:
+    #   vocab.offsets.npy + vocab.data.npy    sorted terms
+    #   postings.offsets.npy                  n_terms+1 offsets into the postings
+    #   postings.quotes.npy                   int32 quote ids
+    #   postings.weights.npy                  float32 BM25 weight of the term in the quote
+    #   quotes.offsets.npy + quotes.data.npy  quote texts, stage directions removed
+    #   quotes.tokens.npy                     estimated prompt tokens per quote
+    # The weights are precomputed, so scoring a query is a sum over its terms' postings.
+    def __init__(self, csv_path, index_path=None):
+        self.csv_path = str(csv_path)
+        self.index_path = str(index_path) if index_path is not None else quote_index_path_for(csv_path)
+        self.lock = threading.Lock()
+        self.partitions = None
+
+    def read_meta(self):
+        meta_path = os.path.join(self.index_path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def get_source(self):
+        stat = os.stat(self.csv_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def is_fresh(self):
+        meta = self.read_meta()
+        if meta is None or meta.get('version') != QUOTE_INDEX_VERSION:
+            return False
+        if not os.path.exists(self.csv_path):
+            return True
+        return meta.get('source') == self.get_source()
+
+    def build(self):
+        df = pd.read_csv(self.csv_path)
+        quotes_by_character = {}
+        for name, line in zip(df['name'], df['line']):
+            character = get_character_key(name)
+            quote = clean_line(line)
+            if character is None or not tokenize(quote):
+                continue
+            # dict keeps the first occurrence of repeated lines, in CSV order
+            quotes_by_character.setdefault(character, {})[quote] = None
+
+        tmp_path = self.index_path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        characters = []
+        for index, (character, quotes) in enumerate(sorted(quotes_by_character.items())):
+            quotes = list(quotes)
+            prefix = os.path.join(tmp_path, str(index))
+            os.makedirs(prefix)
+            arrays = build_character_arrays(quotes)
+            for name, strings in (('vocab', arrays.pop('vocab')), ('quotes', quotes)):
+                offsets, data = encode_strings(strings)
+                np.save(os.path.join(prefix, f'{name}.offsets.npy'), offsets)
+                np.save(os.path.join(prefix, f'{name}.data.npy'), data)
+            for name, array in arrays.items():
+                np.save(os.path.join(prefix, f'{name}.npy'), array)
+            characters.append({'name': character, 'num_quotes': len(quotes)})
+
+        meta = {'version': QUOTE_INDEX_VERSION, 'k1': BM25_K1, 'b': BM25_B,
+                'source': self.get_source(), 'characters': characters}
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+
+        # Swap the finished directory into place
+        if os.path.exists(self.index_path):
+            shutil.rmtree(self.index_path)
+        os.replace(tmp_path, self.index_path)
+        return meta
+
+    def load(self, mmap_mode='r'):
+        # Arrays stay memory-mapped; only each character's vocab is decoded, for term lookup
+        meta = self.read_meta()
+        partitions = {}
+        for index, character in enumerate(meta['characters']):
+            prefix = os.path.join(self.index_path, str(index))
+            load = lambda name: np.load(os.path.join(prefix, f'{name}.npy'), mmap_mode=mmap_mode)
+            vocab = decode_strings(load('vocab.offsets'), load('vocab.data'))
+            partitions[character['name']] = {
+                'terms': {term: term_id for term_id, term in enumerate(vocab)},
+                'postings.offsets': load('postings.offsets'),
+                'postings.quotes': load('postings.quotes'),
+                'postings.weights': load('postings.weights'),
+                'quotes.offsets': load('quotes.offsets'),
+                'quotes.data': load('quotes.data'),
+                'quotes.tokens': load('quotes.tokens'),
+                'num_quotes': character['num_quotes'],
+            }
+        return partitions
+
+    def get_partitions(self):
+        # Built or loaded on first use, then kept; rebuilt only when the CSV changed
+        if self.partitions is None:
+            with self.lock:
+                if self.partitions is None:
+                    if not self.is_fresh():
+                        self.build()
+                    self.partitions = self.load()
+        return self.partitions
+
+    def get_quote(self, partition, quote_id):
+        offsets = partition['quotes.offsets']
+        return partition['quotes.data'][offsets[quote_id]:offsets[quote_id + 1]].tobytes().decode('utf-8')
+
+    def rank(self, character, query, k):
+        # Ids and scores of the character's k best lines for the query, best first
+        partition = self.get_partitions().get(character)
+        if partition is None:
+            return None, [], []
+
+        term_ids = [partition['terms'][token] for token in dict.fromkeys(tokenize(query))
+                    if token in partition['terms']]
+        if not term_ids:
+            return partition, [], []
+
+        offsets = partition['postings.offsets']
+        spans = [slice(offsets[term_id], offsets[term_id + 1]) for term_id in term_ids]
+        quote_ids = np.concatenate([partition['postings.quotes'][span] for span in spans])
+        weights = np.concatenate([partition['postings.weights'][span] for span in spans])
+        scores = np.bincount(quote_ids, weights=weights, minlength=partition['num_quotes'])
+
+        # Partial selection of the k best, then only those k are sorted
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return partition, matched.tolist(), scores[matched].tolist()
+
+    def search(self, character, query, k=5):
+        partition, quote_ids, scores = self.rank(character, query, k)
+        return [(self.get_quote(partition, quote_id), score) for quote_id, score in zip(quote_ids, scores)]
+
+    def get_quotes(self, character, query, k=4, token_budget=200):
+        # The best quotes that fit in token_budget together; a quote too long
+        # for what is left is skipped in favour of the next shorter one
+        partition, quote_ids, _ = self.rank(character, query, k)
+        selected = []
+        remaining = token_budget
+        for quote_id in quote_ids:
+            tokens = int(partition['quotes.tokens'][quote_id])
+            if tokens <= remaining:
+                selected.append(self.get_quote(partition, quote_id))
+                remaining -= tokens
+        return selected
+
+    def get_stats(self):
+        partitions = self.get_partitions()
+        return {character: {'quotes': partition['num_quotes'], 'terms': len(partition['terms'])}
+                for character, partition in partitions.items()}
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+def normalize_message(message):
+    # "What's your dream?" and "  what's your DREAM " ask the same thing
+    return " ".join(message.casefold().split()).rstrip("?!. ")
+
+def get_history_window(history, window):
+    # Gradio passes (user, bot) pairs or {"role", "content"} messages
+    window_items = history[-window:] if window else []
+    return [list(item) if isinstance(item, (list, tuple)) else item for item in window_items]
+
+class ResponseCache():
+    # Chat replies keyed by model, character, normalized message and the
+    # history window the prompt is built from. Entries expire after
+    # ttl_seconds, and the least recently used go once max_entries is
+    # exceeded. With disk_path, entries also survive restarts in SQLite.
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_path=None, clock=time.time):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = str(disk_path) if disk_path is not None else None
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+        if self.disk_path is not None:
+            directory = os.path.dirname(self.disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self.connect() as connection:
+                connection.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+
+    @contextmanager
+    def connect(self):
+        # One short-lived connection per call, so instances can be shared across threads
+        connection = sqlite3.connect(self.disk_path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_key(self, model_name, character, message, history, window=6):
+        payload = json.dumps([model_name, character, normalize_message(message),
+                              get_history_window(history, window)], ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return response
+                del self.entries[key]
+                self.stats['expirations'] += 1
+
+        if self.disk_path is not None:
+            with self.connect() as connection:
+                row = connection.execute("SELECT response, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] > now:
+                with self.lock:
+                    self.stats['disk_hits'] += 1
+                    self.put_in_memory(key, row[0], row[1])
+                return row[0]
+
+        with self.lock:
+            self.stats['misses'] += 1
+        return None
+
+    def put_in_memory(self, key, response, expires_at):
+        self.entries[key] = (response, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def set(self, key, response):
+        expires_at = self.clock() + self.ttl_seconds
+        with self.lock:
+            self.put_in_memory(key, response, expires_at)
+
+        if self.disk_path is not None:
+            with self.connect() as connection:
+                connection.execute("INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                                   (key, response, expires_at))
+                connection.execute("DELETE FROM responses WHERE expires_at <= ?", (self.clock(),))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.disk_path is not None:
+            with self.connect() as connection:
+                connection.execute("DELETE FROM responses")
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['disk_hits'] + self.stats['misses']
+            return dict(self.stats,
+                        entries=len(self.entries),
+                        hit_rate=(self.stats['hits'] + self.stats['disk_hits']) / lookups if lookups else 0.0)
@@ -1,2 +1,3 @@
 from .named_entity_recognizer import NamedEntityRecognizer
-from .character_network_generator import CharacterNetworkGenerator
\ No newline at end of file
+from .character_network_generator import CharacterNetworkGenerator
+from .cooccurrence import CooccurrenceAccumulator
\ No newline at end of file
@@ -0,0 +1,90 @@
+import argparse
+import os
+import random
+import sys
+import time
+from ast import literal_eval
+import pandas as pd
+
+# Run as a script: python character_network/benchmark_cooccurrence.py
+from cooccurrence import generate_relationship_df
+
+def generate_relationship_df_reference(ners_rows, windows=10):
+    # The original list-based implementation, kept as the reference output
+    entity_relationship = []
+
+    for row in ners_rows:
+        previous_entities_in_window = []
+
+        for sentence in row:
+            previous_entities_in_window.append(list(sentence))
+            previous_entities_in_window = previous_entities_in_window[-windows:]
+
+            # Flatten 2D List into 1D List
+            previous_entities_flattened = sum(previous_entities_in_window, [])
+
+            for entity in sentence:
+                for entity_in_window in previous_entities_flattened:
+                    if entity != entity_in_window:
+                        entity_relationship.append(sorted([entity, entity_in_window]))
+
+    relationship_df = pd.DataFrame({'value': entity_relationship})
+    relationship_df['source'] = relationship_df['value'].apply(lambda x: x[0])
+    relationship_df['target'] = relationship_df['value'].apply(lambda x: x[1])
+    relationship_df = relationship_df.groupby(['source', 'target']).count().reset_index()
+    relationship_df = relationship_df.sort_values('value', ascending=False)
+
+    return relationship_df
+
+def make_synthetic_corpus(ners_rows, scale, seed=0):
+    # Repeats the real corpus `scale` times, renaming a share of the characters
+    # in every copy so the number of distinct edges grows as well
+    rng = random.Random(seed)
+    rows = []
+    for copy in range(scale):
+        for row in ners_rows:
+            renamed = []
+            for sentence in row:
+                renamed.append({name if rng.random() < 0.7 else f"{name}_{copy}" for name in sentence})
+            rows.append(renamed)
+    return rows
+
+def time_call(function, *args, repeat=1):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_benchmark(ners_rows, label, repeat=3):
+    reference_time, reference_df = time_call(generate_relationship_df_reference, ners_rows)
+    engine_time, engine_df = time_call(generate_relationship_df, ners_rows, 10, repeat=repeat)
+
+    identical = reference_df.reset_index(drop=True).equals(engine_df.reset_index(drop=True)) \
+        and reference_df.index.equals(engine_df.index)
+    num_sentences = sum(len(row) for row in ners_rows)
+    print(f"{label}: {len(ners_rows)} episodes, {num_sentences} sentences, {len(engine_df)} edges")
+    print(f"   reference {reference_time*1000:10.1f} ms")
+    print(f"   sparse    {engine_time*1000:10.1f} ms   ({reference_time/engine_time:.1f}x faster)")
+    print(f"   identical output: {identical}")
+    return identical
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the character co-occurrence engine")
+    parser.add_argument('--ner-path', default=os.path.join(os.path.dirname(__file__), '..', 'stubs', 'ner_output.csv'))
+    parser.add_argument('--scale', type=int, default=10)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.ner_path)
+    ners_rows = df['ners'].apply(lambda x: literal_eval(x) if isinstance(x,str) else x).tolist()
+
+    all_identical = run_benchmark(ners_rows, "stubs")
+    all_identical &= run_benchmark(make_synthetic_corpus(ners_rows, args.scale), f"synthetic {args.scale}x")
+
+    sys.exit(0 if all_identical else 1)
+
+if __name__ == '__main__':
+    main()
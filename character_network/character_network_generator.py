@@ -1,42 +1,93 @@
 import pandas as pd
-import networkx as nx
-from pyvis.network import Network
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from .cooccurrence import generate_relationship_df, CooccurrenceAccumulator
+
+# Rendered iframes keyed by a fingerprint of the edges and render parameters,
+# shared by every generator instance in the process
+RENDER_CACHE_SIZE = 16
+render_cache = OrderedDict()
 
 class CharacterNetworkGenerator():
     def __init__(self):
         pass
 
-    def generate_character_network(self,df):
-
+    def generate_character_network(self,df,source_path=None):
         windows=10
-        entity_relationship = []
 
-        for row in df['ners']:
-            previous_entities_in_window = []
+        # Entities are interned to integer ids and the window co-occurrences are
+        # counted with sparse matrix products (see cooccurrence.py)
+        relationship_df = generate_relationship_df(df['ners'], window=windows)
 
-            for sentence in row:
-                previous_entities_in_window.append(list(sentence))
-                previous_entities_in_window = previous_entities_in_window[-windows:]
+        # Edges built from a saved NER output are identified by that file, so
+        # rendering them again never has to hash the edges themselves
+        if source_path is not None and os.path.exists(source_path):
+            stat = os.stat(source_path)
+            relationship_df.attrs['fingerprint'] = (f"{os.path.abspath(source_path)}:{stat.st_size}:"
+                                                    f"{stat.st_mtime_ns}:window={windows}")
 
-                # Flatten 2D List into 1D List
-                previous_entities_flattened = sum(previous_entities_in_window, [])
+        return relationship_df
 
-                for entity in sentence:
-                    for entity_in_window in previous_entities_flattened:
-                        if entity != entity_in_window:
-                            entity_relationship.append(sorted([entity, entity_in_window]))
-        
-        relationship_df = pd.DataFrame({'value': entity_relationship})
-        relationship_df['source'] = relationship_df['value'].apply(lambda x: x[0])
-        relationship_df['target'] = relationship_df['value'].apply(lambda x: x[1])
-        relationship_df = relationship_df.groupby(['source', 'target']).count().reset_index()
-        relationship_df = relationship_df.sort_values('value', ascending=False)
+    def update_character_network(self, ner_dfs, state_path=None):
+        # Adds episodes from a stream of NER DataFrames (e.g. NamedEntityRecognizer.iter_ners)
+        # to a saved network, skipping episodes it already holds
+        if state_path is not None and os.path.exists(state_path):
+            accumulator = CooccurrenceAccumulator.load(state_path)
+        else:
+            accumulator = CooccurrenceAccumulator(window=10)
+
+        for df in ner_dfs:
+            accumulator.add_episodes(df)
+            if state_path is not None:
+                accumulator.save(state_path)
 
+        relationship_df = accumulator.to_relationship_df()
         return relationship_df
     
-    def draw_network_graph(self,relationship_df):
-        relationship_df = relationship_df.sort_values('value', ascending=False)
-        relationship_df = relationship_df.head(200)
+    def select_top_edges(self, relationship_df, top_n):
+        # Partial selection of the top_n heaviest edges (ties broken by row order)
+        # instead of sorting every edge
+        values = relationship_df['value'].to_numpy()
+        if len(values) > top_n:
+            threshold = np.partition(values, len(values) - top_n)[len(values) - top_n]
+            above = np.nonzero(values > threshold)[0]
+            ties = np.nonzero(values == threshold)[0][:top_n - len(above)]
+            relationship_df = relationship_df.iloc[np.sort(np.concatenate([above, ties]))]
+
+        return relationship_df.sort_values('value', ascending=False, kind='stable')
+
+    def get_edges_fingerprint(self, relationship_df):
+        # Hash of every edge; only for frames that don't carry a fingerprint,
+        # and stored on the frame so it is computed once per frame
+        hasher = hashlib.sha256()
+        hasher.update("\0".join(relationship_df['source'].astype(str).tolist()).encode('utf-8'))
+        hasher.update(b"\1")
+        hasher.update("\0".join(relationship_df['target'].astype(str).tolist()).encode('utf-8'))
+        hasher.update(relationship_df['value'].to_numpy(dtype=np.int64).tobytes())
+        fingerprint = hasher.hexdigest()
+        relationship_df.attrs['fingerprint'] = fingerprint
+        return fingerprint
+
+    def get_render_key(self, relationship_df, render_params):
+        fingerprint = relationship_df.attrs.get('fingerprint')
+        if fingerprint is None:
+            fingerprint = self.get_edges_fingerprint(relationship_df)
+        return (fingerprint, tuple(sorted(render_params.items())))
+
+    def draw_network_graph(self,relationship_df,top_n=200,width="1000px",height="700px",bgcolor="#222222",font_color="white"):
+        render_params = dict(top_n=top_n, width=width, height=height, bgcolor=bgcolor, font_color=font_color)
+        render_key = self.get_render_key(relationship_df, render_params)
+        if render_key in render_cache:
+            render_cache.move_to_end(render_key)
+            return render_cache[render_key]
+
+        relationship_df = self.select_top_edges(relationship_df, top_n)
+
+        # Imported on first render; pyvis alone takes over half a second to import
+        import networkx as nx
+        from pyvis.network import Network
 
         G = nx.from_pandas_edgelist(
             relationship_df, 
@@ -46,7 +97,7 @@ class CharacterNetworkGenerator():
             create_using=nx.Graph()
         )
 
-        net = Network(notebook=True, width="1000px", height="700px", bgcolor="#222222", font_color="white", cdn_resources="remote")
+        net = Network(notebook=True, width=width, height=height, bgcolor=bgcolor, font_color=font_color, cdn_resources="remote")
         node_degree = dict(G.degree)
 
         nx.set_node_attributes(G, node_degree, 'size')
@@ -60,8 +111,9 @@ class CharacterNetworkGenerator():
     allow-scripts allow-same-origin allow-popups
     allow-top-navigation-by-user-activation allow-downloads" allowfullscreen=""
     allowpaymentrequest="" frameborder="0" srcdoc='{html}'></iframe>"""
+
+        render_cache[render_key] = output_html
+        if len(render_cache) > RENDER_CACHE_SIZE:
+            render_cache.popitem(last=False)
         
         return output_html
-
-
-
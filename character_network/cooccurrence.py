@@ -0,0 +1,184 @@
+import json
+import numpy as np
+import pandas as pd
+from scipy import sparse
+import os
+import sys
+import pathlib
+
+folder_path = pathlib.Path(__file__).parent.resolve()
+sys.path.append(os.path.join(folder_path,'../'))
+from utils.columnar_store import EntityColumn
+
+def count_window_cooccurrences(column, window=10):
+    # Counts, for every pair of distinct entities, how often one appears in a
+    # sentence while the other appears in that sentence or one of the
+    # window-1 sentences before it (within the same episode).
+    #
+    # With X the (sentences x entities) incidence matrix and W the banded
+    # (sentences x sentences) window matrix, M = X^T W X holds the directed
+    # counts and M + M^T the counts of each unordered pair.
+    row_offsets = np.asarray(column.row_offsets, dtype=np.int64)
+    sentence_offsets = np.asarray(column.sentence_offsets, dtype=np.int64)
+    values = np.asarray(column.values, dtype=np.int64)
+
+    num_entities = len(column.vocab)
+    num_sentences = len(sentence_offsets) - 1
+    if num_entities == 0 or num_sentences == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # Only sentences that mention someone matter. Give each of them a position
+    # that grows by at least `window` between episodes, so a sentence's window
+    # is simply every non-empty sentence within window-1 positions before it.
+    episode_of_sentence = np.repeat(np.arange(len(row_offsets) - 1), np.diff(row_offsets))
+    position = np.arange(num_sentences) + episode_of_sentence * window
+
+    sentence_sizes = np.diff(sentence_offsets)
+    non_empty = np.nonzero(sentence_sizes)[0]
+    non_empty_position = position[non_empty]
+
+    X = sparse.csr_matrix((np.ones(len(values), dtype=np.int64),
+                           (np.repeat(np.arange(len(non_empty)), sentence_sizes[non_empty]), values)),
+                          shape=(len(non_empty), num_entities))
+
+    window_start = np.searchsorted(non_empty_position, non_empty_position - (window - 1))
+    window_sizes = np.arange(len(non_empty)) - window_start + 1
+    window_rows = np.repeat(np.arange(len(non_empty)), window_sizes)
+    window_cols = np.arange(len(window_rows)) - np.repeat(np.cumsum(window_sizes) - window_sizes, window_sizes) \
+        + np.repeat(window_start, window_sizes)
+    W = sparse.csr_matrix((np.ones(len(window_rows), dtype=np.int64), (window_rows, window_cols)),
+                          shape=(len(non_empty), len(non_empty)))
+
+    M = (X.T @ (W @ X)).tocsr()
+    pairs = sparse.triu(M + M.T, k=1).tocoo()
+    return pairs.row.astype(np.int64), pairs.col.astype(np.int64), pairs.data.astype(np.int64)
+
+def build_relationship_df(vocab, sources, targets, counts):
+    # Same frame (columns, index and row order) as grouping the sorted name
+    # pairs with pandas and sorting by count
+    vocab = np.asarray(vocab, dtype=object)
+    source_names = vocab[sources]
+    target_names = vocab[targets]
+
+    swap = source_names > target_names
+    source_names, target_names = np.where(swap, target_names, source_names), np.where(swap, source_names, target_names)
+
+    relationship_df = pd.DataFrame({'source': source_names, 'target': target_names, 'value': counts})
+    relationship_df = relationship_df.sort_values(['source', 'target']).reset_index(drop=True)
+    relationship_df['value'] = relationship_df['value'].astype(np.int64)
+    relationship_df = relationship_df.sort_values('value', ascending=False)
+    return relationship_df
+
+def generate_relationship_df(ners_rows, window=10):
+    column = ners_rows if isinstance(ners_rows, EntityColumn) else EntityColumn.from_rows(list(ners_rows))
+    sources, targets, counts = count_window_cooccurrences(column, window)
+    return build_relationship_df(column.vocab, sources, targets, counts)
+
+class CooccurrenceAccumulator():
+    # Builds the network one episode at a time while keeping only aggregated
+    # edge counts: memory grows with the number of distinct edges, not with the
+    # corpus. Counts are additive across episodes because windows never cross
+    # episode boundaries, so the result equals generate_relationship_df on the
+    # full corpus.
+    def __init__(self, window=10, flush_size=200000):
+        self.window = window
+        self.flush_size = flush_size
+        self.vocab = []
+        self.vocab_index = {}
+        self.episodes = set()
+        # Edge (a, b) with a < b is packed as a << 32 | b
+        self.edge_keys = np.zeros(0, dtype=np.int64)
+        self.edge_counts = np.zeros(0, dtype=np.int64)
+        self.pending_keys = []
+        self.pending_counts = []
+        self.pending_size = 0
+
+    def __len__(self):
+        self.flush()
+        return len(self.edge_keys)
+
+    def add_episode(self, ners, episode=None):
+        if episode is not None:
+            # numpy scalars from a DataFrame are stored as plain Python values
+            episode = episode.item() if hasattr(episode, 'item') else episode
+            if episode in self.episodes:
+                return False
+            self.episodes.add(episode)
+
+        column = EntityColumn.from_rows([ners])
+        sources, targets, counts = count_window_cooccurrences(column, self.window)
+        if len(counts) == 0:
+            return True
+
+        # Map episode-local ids to accumulator ids
+        global_ids = []
+        for name in column.vocab:
+            if name not in self.vocab_index:
+                self.vocab_index[name] = len(self.vocab)
+                self.vocab.append(name)
+            global_ids.append(self.vocab_index[name])
+        global_ids = np.asarray(global_ids, dtype=np.int64)
+
+        sources = global_ids[sources]
+        targets = global_ids[targets]
+        low = np.minimum(sources, targets)
+        high = np.maximum(sources, targets)
+
+        self.pending_keys.append((low << 32) | high)
+        self.pending_counts.append(counts)
+        self.pending_size += len(counts)
+        if self.pending_size >= self.flush_size:
+            self.flush()
+        return True
+
+    def add_episodes(self, df):
+        added = 0
+        for episode, ners in zip(df['episode'], df['ners']):
+            added += int(self.add_episode(ners, episode))
+        return added
+
+    def flush(self):
+        if not self.pending_keys:
+            return
+
+        keys = np.concatenate([self.edge_keys] + self.pending_keys)
+        counts = np.concatenate([self.edge_counts] + self.pending_counts)
+        self.edge_keys, inverse = np.unique(keys, return_inverse=True)
+        self.edge_counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(self.edge_keys)).astype(np.int64)
+
+        self.pending_keys = []
+        self.pending_counts = []
+        self.pending_size = 0
+
+    def to_relationship_df(self):
+        self.flush()
+        sources = self.edge_keys >> 32
+        targets = self.edge_keys & 0xFFFFFFFF
+        return build_relationship_df(self.vocab, sources, targets, self.edge_counts)
+
+    def save(self, path):
+        self.flush()
+        state = {
+            'window': self.window,
+            'vocab': self.vocab,
+            'episodes': sorted(self.episodes, key=str),
+        }
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path,
+                 state=np.array(json.dumps(state)),
+                 edge_keys=self.edge_keys,
+                 edge_counts=self.edge_counts)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            state = json.loads(str(data['state']))
+            accumulator = cls(window=state['window'])
+            accumulator.vocab = state['vocab']
+            accumulator.vocab_index = {name: index for index, name in enumerate(accumulator.vocab)}
+            accumulator.episodes = set(state['episodes'])
+            accumulator.edge_keys = data['edge_keys']
+            accumulator.edge_counts = data['edge_counts']
+        return accumulator
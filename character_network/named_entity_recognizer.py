@@ -1,54 +1,168 @@
-import spacy
-from nltk.tokenize import sent_tokenize
 import pandas as pd
-from ast import literal_eval
 import os 
 import sys
 import pathlib
+import tempfile
+import time
+from ast import literal_eval
 folder_path = pathlib.Path().parent.resolve()
 sys.path.append(os.path.join(folder_path, '../'))
-from utils import load_subtitles_dataset
+from utils import load_subtitles_dataset, iter_subtitles_batches, read_csv_columnar, write_csv_columnar, write_csv_batches, model_registry, sent_tokenize
+from .ner_cache import NerEpisodeCache
+
+# en_core_web_trf components that PERSON extraction never reads; excluding them
+# skips loading their weights and running them on every sentence
+NER_UNUSED_COMPONENTS = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
 
 class NamedEntityRecognizer:
-    def __init__(self):
-        self.nlp_model = self.load_model()
-        pass
+    def __init__(self, model_name="en_core_web_trf", batch_size=64, n_process=1):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.last_throughput = None
+        self._nlp_model = None
+
+    @property
+    def nlp_model(self):
+        # Loaded on first inference, so fully cached runs never pay for it
+        if self._nlp_model is None:
+            self._nlp_model = self.load_model()
+        return self._nlp_model
 
     def load_model(self):
-        nlp = spacy.load("en_core_web_trf")
+        import spacy
+
+        # Shared across recognizer instances through the process-wide registry
+        nlp = model_registry.get(
+            ("spacy", self.model_name, tuple(NER_UNUSED_COMPONENTS)),
+            lambda: spacy.load(self.model_name, exclude=NER_UNUSED_COMPONENTS)
+        )
         return nlp
 
+    def get_model_version(self):
+        import spacy
+
+        version = spacy.util.get_package_version(self.model_name)
+        if version is None:
+            version = self.nlp_model.meta.get('version')
+        return version
+
+    def get_person_names(self, doc):
+        ners = set()
+        for entity in doc.ents:
+            if entity.label_ =="PERSON":
+                full_name = entity.text
+                first_name = full_name.split(" ")[0]
+                first_name = first_name.strip()
+                ners.add(first_name)
+        return ners
+
     def get_ners_inference(self,script):
-        script_sentences = sent_tokenize(script)
+        return self.get_ners_inference_batch([script])[0]
+
+    def get_ners_inference_batch(self,scripts):
+        # Flatten the sentences of every script into one stream for nlp.pipe
+        # and remember where each script starts so the output can be regrouped
+        all_sentences = []
+        script_offsets = [0]
+        for script in scripts:
+            all_sentences.extend(sent_tokenize(script))
+            script_offsets.append(len(all_sentences))
 
-        ner_output = []
+        start_time = time.perf_counter()
+        docs = self.nlp_model.pipe(all_sentences,
+                                   batch_size=self.batch_size,
+                                   n_process=self.n_process)
+        sentence_ners = [self.get_person_names(doc) for doc in docs]
+        elapsed = time.perf_counter() - start_time
 
-        for sentence in script_sentences:
-            doc = self.nlp_model(sentence)
-            ners = set()
-            for entity in doc.ents:
-                if entity.label_ =="PERSON":
-                    full_name = entity.text
-                    first_name = full_name.split(" ")[0]
-                    first_name = first_name.strip()
-                    ners.add(first_name)
-            ner_output.append(ners)
+        self.last_throughput = {
+            "scripts": len(scripts),
+            "sentences": len(all_sentences),
+            "seconds": elapsed,
+            "sentences_per_sec": len(all_sentences) / elapsed if elapsed > 0 else 0.0,
+        }
+        print(f"NER: {len(all_sentences)} sentences from {len(scripts)} scripts in {elapsed:.1f}s "
+              f"({self.last_throughput['sentences_per_sec']:.1f} sentences/sec, "
+              f"batch_size={self.batch_size}, n_process={self.n_process})")
 
-        return ner_output
+        return [sentence_ners[start:end] for start, end in zip(script_offsets[:-1], script_offsets[1:])]
+
+    def iter_ners(self,dataset_path,episodes_per_batch=10,num_workers=1):
+        # Lazily run inference batch by batch so the whole corpus is never held in memory
+        for df in iter_subtitles_batches(dataset_path,episodes_per_batch,num_workers):
+            df['ners'] = self.get_ners_inference_batch(df['script'].tolist())
+            yield df
+
+    def get_ners(self,dataset_path,save_path=None,episodes_per_batch=None,num_workers=1,cache_dir=None,return_df=True):
+        if cache_dir is not None and dataset_path:
+            return self.get_ners_incremental(dataset_path,save_path,cache_dir,num_workers)
 
-    def get_ners(self,dataset_path,save_path=None):
         if save_path is not None and os.path.exists(save_path):
-            df = pd.read_csv(save_path)
-            df['ners'] = df['ners'].apply(lambda x: literal_eval(x) if isinstance(x,str) else x)
+            # Served from the memory-mapped columnar copy, converted from the CSV on first use
+            df = read_csv_columnar(save_path, entity_columns=['ners'])
             return df
 
+        if episodes_per_batch is not None:
+            return self.get_ners_streaming(dataset_path,save_path,episodes_per_batch,num_workers,return_df)
+
         # load dataset 
-        df = load_subtitles_dataset(dataset_path)
+        df = load_subtitles_dataset(dataset_path,num_workers=num_workers)
 
-        # Run Inference
-        df['ners'] = df['script'].apply(self.get_ners_inference)
+        # Run Inference over all episodes in one batched pass
+        df['ners'] = self.get_ners_inference_batch(df['script'].tolist())
 
         if save_path is not None:
-            df.to_csv(save_path,index=False)
+            write_csv_columnar(df, save_path, entity_columns=['ners'])
         
-        return df
\ No newline at end of file
+        return df
+
+    def get_ners_streaming(self,dataset_path,save_path,episodes_per_batch,num_workers=1,return_df=True):
+        # Each batch is written out as soon as it is inferred and then dropped, so
+        # only the batch in flight is held in memory. The finished output is read
+        # back only when return_df is set; with return_df=False the path is returned.
+        batches = self.iter_ners(dataset_path,episodes_per_batch,num_workers)
+        if save_path is None:
+            # Nowhere to keep the output: the batches go to a temporary file instead of memory
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                tmp_path = os.path.join(tmp_dir,'ner_output.csv')
+                if write_csv_batches(batches,tmp_path) == 0:
+                    return pd.DataFrame(columns=['episode','script','ners'])
+                return pd.read_csv(tmp_path,converters={'ners': literal_eval})
+
+        if write_csv_batches(batches,save_path) == 0:
+            return pd.DataFrame(columns=['episode','script','ners']) if return_df else None
+        if not return_df:
+            return save_path
+        # Through the memory-mapped columnar copy, written on this first read
+        return read_csv_columnar(save_path, entity_columns=['ners'])
+
+    def get_ners_incremental(self,dataset_path,save_path,cache_dir,num_workers=1):
+        # Only episodes whose script (or the model) changed since the last run are inferred;
+        # everything else comes from the per-episode cache
+        cache = NerEpisodeCache(cache_dir, self.model_name, self.get_model_version())
+
+        df = load_subtitles_dataset(dataset_path,num_workers=num_workers)
+        keys = [cache.get_key(script) for script in df['script']]
+        ners = [cache.get(key) for key in keys]
+
+        missing = [index for index, episode_ners in enumerate(ners) if episode_ners is None]
+        if missing:
+            inferred = self.get_ners_inference_batch([df['script'].iloc[index] for index in missing])
+            for index, episode_ners in zip(missing, inferred):
+                cache.set(keys[index], episode_ners)
+                ners[index] = episode_ners
+        print(f"NER cache: {len(df) - len(missing)} episodes reused, {len(missing)} inferred")
+
+        df['ners'] = ners
+
+        # Merge into the existing output, keeping episodes that are not part of this dataset
+        if save_path is not None and os.path.exists(save_path):
+            existing_df = read_csv_columnar(save_path, entity_columns=['ners'])
+            existing_df = existing_df[~existing_df['episode'].isin(df['episode'])]
+            df = pd.concat([existing_df, df]).sort_values('episode').reset_index(drop=True)
+
+        if save_path is not None:
+            write_csv_columnar(df, save_path, entity_columns=['ners'])
+
+        return df
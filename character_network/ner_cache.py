@@ -0,0 +1,49 @@
+import hashlib
+import json
+import os
+
+# Bump when the way PERSON names are extracted from a doc changes,
+# so entries written by the old logic are no longer hit
+NER_CACHE_VERSION = 1
+
+class NerEpisodeCache():
+    def __init__(self, cache_dir, model_name, model_version):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.model_version = model_version
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, script):
+        hasher = hashlib.sha256()
+        hasher.update(f"{NER_CACHE_VERSION}\0{self.model_name}\0{self.model_version}\0".encode('utf-8'))
+        hasher.update(script.encode('utf-8'))
+        return hasher.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key):
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            # A truncated entry is treated as a miss and rewritten
+            return None
+        return [set(sentence) for sentence in entry['ners']]
+
+    def set(self, key, ners):
+        entry = {
+            'model_name': self.model_name,
+            'model_version': self.model_version,
+            'ners': [sorted(sentence) for sentence in ners],
+        }
+
+        path = self.get_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, path)
@@ -76,6 +76,17 @@ def create_navbar():
                     " onmouseover="this.style.background='rgba(106, 13, 173, 0.3)'; this.style.transform='translateY(-2px)'" 
                     onmouseout="this.style.background='rgba(0, 0, 0, 0.3)'; this.style.transform='none'">Jutsu</a>
                     
+                    <a href="#search-section" style="
+                        color: #FFD700; 
+                        text-decoration: none; 
+                        font-weight: 600;
+                        padding: 8px 16px;
+                        border-radius: 6px;
+                        transition: all 0.3s ease;
+                        background: rgba(0, 0, 0, 0.3);
+                    " onmouseover="this.style.background='rgba(255, 140, 0, 0.3)'; this.style.transform='translateY(-2px)'" 
+                    onmouseout="this.style.background='rgba(0, 0, 0, 0.3)'; this.style.transform='none'">Search</a>
+                    
                     <a href="#chat-section" style="
                         color: #FFD700; 
                         text-decoration: none; 
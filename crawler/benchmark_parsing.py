@@ -0,0 +1,104 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import warnings
+from bs4 import BeautifulSoup, GuessedAtParserWarning
+from parsel import Selector
+
+# Run as a script: python crawler/benchmark_parsing.py
+from jutsu_parser import extract_jutsu
+
+# The reference keeps the original parser-less BeautifulSoup call
+warnings.filterwarnings("ignore", category=GuessedAtParserWarning)
+
+def extract_jutsu_reference(response):
+    # The original parse_jutsu: serializes the content div and parses it again with BeautifulSoup
+    jutsu_name = response.css("span.mw-page-title-main::text").extract()[0]
+    jutsu_name = jutsu_name.strip()
+
+    div_selector = response.css("div.mw-parser-output")[0]
+    div_html = div_selector.extract()
+
+    soup = BeautifulSoup(div_html).find('div')
+
+    jutsu_type=""
+    if soup.find('aside'):
+        aside = soup.find('aside')
+
+        for cell in aside.find_all('div',{'class':'pi-data'}):
+            if cell.find('h3'):
+                cell_name = cell.find('h3').text.strip()
+                if cell_name == "Classification":
+                    jutsu_type = cell.find('div').text.strip()
+
+    soup.find('aside').decompose()
+
+    jutsu_description = soup.text.strip()
+    jutsu_description = jutsu_description.split('Trivia')[0].strip()
+
+    return dict (
+        jutsu_name = jutsu_name,
+        jutsu_type = jutsu_type,
+        jutsu_description = jutsu_description
+    )
+
+def parse_pages(extract, pages):
+    # Includes building the selector, which scrapy does once per response for either path
+    results = []
+    for page in pages:
+        try:
+            results.append(extract(Selector(text=page)))
+        except Exception as e:
+            results.append(e)
+    return results
+
+def time_parse(extract, pages, repeat=3):
+    best = None
+    results = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        results = parse_pages(extract, pages)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse_jutsu on saved jutsu pages")
+    parser.add_argument('--pages-dir', default=os.path.join(os.path.dirname(__file__), 'fixtures', 'wiki'))
+    parser.add_argument('--repeat-pages', type=int, default=200, help="parse each saved page this many times")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.pages_dir, '*.html')))
+    saved_pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            saved_pages.append(file.read())
+
+    # Output check, page by page
+    all_identical = True
+    for path, page in zip(paths, saved_pages):
+        reference = parse_pages(extract_jutsu_reference, [page])[0]
+        extracted = parse_pages(extract_jutsu, [page])[0]
+        if isinstance(reference, Exception):
+            # e.g. pages without an infobox, where the original decompose() fails
+            status = f"reference failed ({type(reference).__name__}), now {extracted}"
+        else:
+            identical = reference == extracted
+            all_identical &= identical
+            status = "identical" if identical else f"DIFFERENT\n      reference {reference}\n      selector  {extracted}"
+        print(f"   {os.path.basename(path)}: {status}")
+
+    pages = saved_pages * args.repeat_pages
+    reference_time, _ = time_parse(extract_jutsu_reference, pages)
+    selector_time, _ = time_parse(extract_jutsu, pages)
+    print(f"{len(pages)} pages ({len(saved_pages)} saved pages x {args.repeat_pages})")
+    print(f"   reference {len(pages)/reference_time:10.0f} pages/s")
+    print(f"   selector  {len(pages)/selector_time:10.0f} pages/s   ({reference_time/selector_time:.1f}x faster)")
+    print(f"   identical output: {all_identical}")
+
+    sys.exit(0 if all_identical else 1)
+
+if __name__ == '__main__':
+    main()
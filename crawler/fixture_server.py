@@ -0,0 +1,101 @@
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+REPO_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    # Serves /wiki/Rasengan from wiki/Rasengan.html with ETag and Last-Modified
+    # validators, answering conditional requests with 304 like the wiki does
+    def get_fixture_path(self):
+        path = self.path.split('?')[0].lstrip('/')
+        if not path.endswith('.html'):
+            path += '.html'
+        return os.path.join(self.directory, path)
+
+    def do_GET(self):
+        path = self.get_fixture_path()
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, 'rb') as file:
+            body = file.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        last_modified = email.utils.formatdate(int(os.path.getmtime(path)), usegmt=True)
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        # Always revalidate, the same policy the wiki serves its pages with
+        self.send_header('Cache-Control', 'max-age=0, must-revalidate')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_fixtures(directory=FIXTURES_DIR, port=0):
+    # Returns a running server on a background thread; server.server_port holds the port
+    handler = lambda *args, **kwargs: FixtureRequestHandler(*args, directory=directory, **kwargs)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_crawl(start_url, output_path, state_dir):
+    # Each crawl needs its own process: the Twisted reactor can't be restarted
+    result = subprocess.run([sys.executable, '-m', 'crawler.jutsu_crawler',
+                             '--start-url', start_url,
+                             '--output-path', output_path,
+                             '--state-dir', state_dir],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the incremental crawl three times against the local fixture pages")
+    parser.add_argument('--port', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        fixtures_dir = os.path.join(work_dir, 'fixtures')
+        shutil.copytree(FIXTURES_DIR, fixtures_dir)
+        output_path = os.path.join(work_dir, 'jutsus.jsonl')
+        state_dir = os.path.join(work_dir, 'state')
+
+        server = serve_fixtures(fixtures_dir, args.port)
+        start_url = f"http://127.0.0.1:{server.server_port}/listing-0.html"
+        try:
+            print("first crawl:", json.dumps(run_crawl(start_url, output_path, state_dir), sort_keys=True))
+            print("unchanged re-crawl:", json.dumps(run_crawl(start_url, output_path, state_dir), sort_keys=True))
+
+            page_path = os.path.join(fixtures_dir, 'wiki', 'Leaf_Hurricane.html')
+            with open(page_path, 'r', encoding='utf-8') as file:
+                page = file.read()
+            with open(page_path, 'w', encoding='utf-8') as file:
+                file.write(page.replace("roundhouse kick", "roundhouse kick, sweeping the legs"))
+            print("one page edited:", json.dumps(run_crawl(start_url, output_path, state_dir), sort_keys=True))
+        finally:
+            server.shutdown()
+
+        with open(output_path, 'r', encoding='utf-8') as file:
+            print(file.read())
+
+if __name__ == '__main__':
+    main()
@@ -1,45 +1,146 @@
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import sys
 import scrapy
-from bs4 import BeautifulSoup
+from scrapy.crawler import CrawlerProcess
+
+folder_path = pathlib.Path(__file__).parent.resolve()
+sys.path.append(str(folder_path))
+from jutsu_parser import extract_jutsu
+
+DEFAULT_START_URL = 'https://naruto.fandom.com/wiki/Special:BrowseData/Jutsu?limit=250&offset=0&_cat=Jutsu'
+DEFAULT_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'jutsus.jsonl')
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(__file__), 'state')
 
 class BlogSpider(scrapy.Spider):
     name = 'narutospider'
-    start_urls = ['https://naruto.fandom.com/wiki/Special:BrowseData/Jutsu?limit=250&offset=0&_cat=Jutsu']
+    start_urls = [DEFAULT_START_URL]
+
+    def __init__(self, start_url=None, base_url=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if start_url:
+            self.start_urls = [start_url]
+        # Jutsu links are site-relative; by default they resolve against the listing page
+        self.base_url = base_url
 
     def parse(self, response):
         for href in response.css('.smw-columnlist-container')[0].css("a::attr(href)").extract():
-            extracted_data = scrapy.Request("https://naruto.fandom.com"+href,
+            url = self.base_url.rstrip('/') + href if self.base_url else response.urljoin(href)
+            extracted_data = scrapy.Request(url,
                            callback=self.parse_jutsu)
             yield extracted_data
 
         for next_page in response.css('a.mw-nextlink'):
             yield response.follow(next_page, self.parse)
-    
+
     def parse_jutsu(self, response):
-        jutsu_name = response.css("span.mw-page-title-main::text").extract()[0]
-        jutsu_name = jutsu_name.strip()
+        return extract_jutsu(response.selector)
+
+def read_jutsus(path):
+    # Existing records keyed by jutsu name, in file order
+    jutsus = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    jutsus[record['jutsu_name']] = record
+    return jutsus
+
+def write_jutsus(path, jutsus):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        for record in jutsus.values():
+            file.write(json.dumps(record) + '\n')
+    os.replace(tmp_path, path)
+
+class JutsuMergePipeline():
+    # Merges scraped jutsus into the existing JSONL by jutsu_name: changed
+    # records are replaced in place, new ones appended, the rest left alone.
+    # The file is rewritten atomically every flush_every changes, so an
+    # interrupted crawl keeps what it already scraped.
+    def __init__(self, output_path, flush_every=100):
+        self.output_path = output_path
+        self.flush_every = flush_every
+        self.pending_changes = 0
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('JUTSU_OUTPUT_PATH', DEFAULT_OUTPUT_PATH),
+                   crawler.settings.getint('JUTSU_FLUSH_EVERY', 100))
+
+    def open_spider(self, spider):
+        self.jutsus = read_jutsus(self.output_path)
+
+    def process_item(self, item, spider):
+        record = dict(item)
+        existing = self.jutsus.get(record['jutsu_name'])
+        if existing == record:
+            self.counts['unchanged'] += 1
+            return item
+
+        self.counts['new' if existing is None else 'changed'] += 1
+        self.jutsus[record['jutsu_name']] = record
+        self.pending_changes += 1
+        if self.pending_changes >= self.flush_every:
+            self.flush()
+        return item
+
+    def flush(self):
+        if self.pending_changes:
+            write_jutsus(self.output_path, self.jutsus)
+            self.pending_changes = 0
 
-        div_selector = response.css("div.mw-parser-output")[0]
-        div_html = div_selector.extract()
+    def close_spider(self, spider):
+        self.flush()
+        for key, value in self.counts.items():
+            spider.crawler.stats.set_value(f'jutsus/{key}', value)
 
-        soup = BeautifulSoup(div_html).find('div')
+def get_incremental_settings(output_path=DEFAULT_OUTPUT_PATH, state_dir=DEFAULT_STATE_DIR):
+    return {
+        # Cached pages are revalidated with If-None-Match / If-Modified-Since;
+        # a 304 reuses the stored body instead of downloading the page again
+        'HTTPCACHE_ENABLED': True,
+        'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.RFC2616Policy',
+        'HTTPCACHE_DIR': os.path.abspath(os.path.join(state_dir, 'httpcache')),
+        # Pending requests and seen fingerprints, so an interrupted crawl resumes
+        'JOBDIR': os.path.join(state_dir, 'job'),
+        'ITEM_PIPELINES': {JutsuMergePipeline: 300},
+        'JUTSU_OUTPUT_PATH': output_path,
+        'LOG_LEVEL': 'INFO',
+    }
 
-        jutsu_type=""
-        if soup.find('aside'):
-            aside = soup.find('aside')
+def run_incremental_crawl(output_path=DEFAULT_OUTPUT_PATH, state_dir=DEFAULT_STATE_DIR, start_url=None, base_url=None):
+    settings = get_incremental_settings(output_path, state_dir)
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(BlogSpider)
+    process.crawl(crawler, start_url=start_url, base_url=base_url)
+    process.start()
 
-            for cell in aside.find_all('div',{'class':'pi-data'}):
-                if cell.find('h3'):
-                    cell_name = cell.find('h3').text.strip()
-                    if cell_name == "Classification":
-                        jutsu_type = cell.find('div').text.strip()
+    stats = crawler.stats.get_stats()
+    # A finished job starts over next time (the HTTP cache keeps it cheap);
+    # an interrupted one keeps its frontier to resume from
+    if stats.get('finish_reason') == 'finished':
+        shutil.rmtree(settings['JOBDIR'], ignore_errors=True)
+    return stats
 
-        soup.find('aside').decompose()
+def main():
+    parser = argparse.ArgumentParser(description="Incremental, resumable jutsu crawl merged into the jutsu JSONL")
+    parser.add_argument('--output-path', default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR)
+    parser.add_argument('--start-url', default=None)
+    parser.add_argument('--base-url', default=None)
+    args = parser.parse_args()
 
-        jutsu_description = soup.text.strip()
-        jutsu_description = jutsu_description.split('Trivia')[0].strip()
+    stats = run_incremental_crawl(args.output_path, args.state_dir, args.start_url, args.base_url)
+    summary = {key: value for key, value in stats.items()
+               if key.startswith(('jutsus/', 'httpcache/', 'downloader/response_status_count/'))
+               or key in ('finish_reason', 'item_scraped_count')}
+    print(json.dumps(summary, default=str, sort_keys=True))
 
-        return dict (
-            jutsu_name = jutsu_name,
-            jutsu_type = jutsu_type,
-            jutsu_description = jutsu_description
-        )
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+from lxml import etree
+
+# Text BeautifulSoup leaves out of .text: code, styles, templates, comments
+SKIPPED_TAGS = {"script", "style", "template"}
+# BeautifulSoup keeps whitespace-only strings as they are only inside these
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+def get_local_name(element):
+    tag = element.tag
+    if not isinstance(tag, str):
+        # Comments and processing instructions
+        return None
+    return etree.QName(tag).localname if tag.startswith('{') else tag
+
+def add_string(parts, string, preserve_whitespace):
+    # Like BeautifulSoup, a whitespace-only string becomes a single newline or space
+    if not preserve_whitespace and not string.strip(ASCII_SPACES):
+        string = "\n" if "\n" in string else " "
+    parts.append(string)
+
+def collect_text(element, parts, skipped=None, preserve_whitespace=False):
+    # Same strings as BeautifulSoup's Tag.text, read straight from the lxml tree
+    if element.text:
+        add_string(parts, element.text, preserve_whitespace)
+    for child in element:
+        name = get_local_name(child)
+        if child is not skipped and name is not None and name not in SKIPPED_TAGS:
+            collect_text(child, parts, skipped, preserve_whitespace or name in PRESERVE_WHITESPACE_TAGS)
+        if child.tail:
+            add_string(parts, child.tail, preserve_whitespace)
+    return parts
+
+def get_text(element, skipped=None):
+    return "".join(collect_text(element, [], skipped))
+
+def extract_jutsu(selector):
+    # Works on the already parsed response (response.selector): the content div
+    # is never serialized back to HTML and parsed a second time
+    jutsu_name = selector.css("span.mw-page-title-main::text").extract()[0]
+    jutsu_name = jutsu_name.strip()
+
+    div = selector.css("div.mw-parser-output")[0].root
+
+    jutsu_type = ""
+    aside = next(div.iterdescendants("aside"), None)
+    if aside is not None:
+        for cell in aside.iterdescendants("div"):
+            if "pi-data" not in (cell.get("class") or "").split():
+                continue
+            header = next(cell.iterdescendants("h3"), None)
+            if header is not None and get_text(header).strip() == "Classification":
+                value = next(cell.iterdescendants("div"), None)
+                jutsu_type = get_text(value).strip() if value is not None else ""
+
+    # The infobox is left out of the description
+    jutsu_description = get_text(div, skipped=aside).strip()
+    jutsu_description = jutsu_description.split('Trivia')[0].strip()
+
+    return dict (
+        jutsu_name = jutsu_name,
+        jutsu_type = jutsu_type,
+        jutsu_description = jutsu_description
+    )
@@ -0,0 +1 @@
+from .search_index import JutsuSearchIndex
\ No newline at end of file
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from .search_index import JutsuSearchIndex
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'jutsus.jsonl')
+QUERIES = ["fire release", "sealing chains", "rasengan", "water dragon", "sharingan genjutsu",
+           "summoning", "wood release", "chakra", "lightning blade", "shadow clo"]
+
+def make_catalog(data_path, size, seed=0):
+    # Real jutsus repeated under new names until the catalog has `size` entries,
+    # with a share of the description words shuffled so the variants differ
+    with open(data_path, 'r', encoding='utf-8') as file:
+        records = [json.loads(line) for line in file if line.strip()]
+
+    rng = random.Random(seed)
+    catalog = []
+    for index in range(size):
+        record = dict(records[index % len(records)])
+        copy = index // len(records)
+        if copy:
+            record['jutsu_name'] = f"{record['jutsu_name']} ({copy})"
+            words = record['jutsu_description'].split()
+            rng.shuffle(words)
+            record['jutsu_description'] = " ".join(words)
+        catalog.append(record)
+    return catalog
+
+def write_catalog(path, catalog):
+    with open(path, 'w', encoding='utf-8') as file:
+        for record in catalog:
+            file.write(json.dumps(record) + '\n')
+
+def time_queries(search_index, queries, repeat=20):
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start_time = time.perf_counter()
+            search_index.search(query)
+            latencies.append(time.perf_counter() - start_time)
+    latencies_ms = np.array(latencies) * 1000
+    return float(np.percentile(latencies_ms, 50)), float(np.percentile(latencies_ms, 99))
+
+def main():
+    parser = argparse.ArgumentParser(description="Index build, incremental update and query latency of the jutsu search index")
+    parser.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    parser.add_argument('--sizes', default="2920,100000")
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as work_dir:
+            jsonl_path = os.path.join(work_dir, 'jutsus.jsonl')
+            catalog = make_catalog(args.data_path, size)
+            write_catalog(jsonl_path, catalog)
+
+            search_index = JutsuSearchIndex(os.path.join(work_dir, 'jutsu_search.sqlite'), jsonl_path)
+            start_time = time.perf_counter()
+            search_index.update()
+            build_seconds = time.perf_counter() - start_time
+
+            # Edit a few records and drop one, as a re-crawl would
+            for record in catalog[:10]:
+                record['jutsu_description'] += " Updated after the latest chapter."
+            catalog.pop()
+            write_catalog(jsonl_path, catalog)
+            start_time = time.perf_counter()
+            counts = search_index.refresh()
+            update_seconds = time.perf_counter() - start_time
+
+            p50_ms, p99_ms = time_queries(search_index, QUERIES)
+            print(f"{size} jutsus: build {build_seconds:.2f}s, incremental update {update_seconds:.2f}s {counts}")
+            print(f"   query p50 {p50_ms:.2f} ms, p99 {p99_ms:.2f} ms (including the freshness check)")
+            for result in search_index.search(QUERIES[0], limit=3):
+                print(f"   {result['score']:7.2f}  {result['jutsu_name']}  [{result['jutsu_type']}]")
+
+if __name__ == '__main__':
+    main()
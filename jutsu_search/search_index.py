@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+
+# Bump when the schema or tokenizer changes; the index is then rebuilt from the JSONL
+SEARCH_INDEX_VERSION = 1
+# bm25 weights for jutsu_name, jutsu_type, jutsu_description
+COLUMN_WEIGHTS = (10.0, 4.0, 1.0)
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def get_record_hash(record):
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()
+
+def build_match_query(query, match_all=True, prefix=False):
+    # User text to an FTS5 expression: every word quoted, so punctuation and
+    # operators are literal; with prefix=True the last word also matches as a
+    # prefix, for half-typed queries
+    tokens = TOKEN_PATTERN.findall(query.lower())
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix:
+        terms[-1] += '*'
+    return (" AND " if match_all else " OR ").join(terms)
+
+class JutsuSearchIndex():
+    # Full-text index over the crawler output (data/jutsus.jsonl) in SQLite FTS5.
+    # Records are keyed by jutsu_name; update() only touches the rows whose
+    # content changed since the last run.
+    def __init__(self, index_path, jsonl_path=None):
+        self.index_path = str(index_path)
+        self.jsonl_path = str(jsonl_path) if jsonl_path is not None else None
+        # Signature of the JSONL this instance last saw indexed; saves a query per search
+        self.indexed_signature = None
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.connect() as connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SEARCH_INDEX_VERSION:
+                connection.executescript("""
+                    DROP TABLE IF EXISTS jutsu_fts;
+                    DROP TABLE IF EXISTS jutsus;
+                    DROP TABLE IF EXISTS index_state;
+                """)
+            connection.executescript(f"""
+                CREATE TABLE IF NOT EXISTS jutsus (
+                    id INTEGER PRIMARY KEY,
+                    jutsu_name TEXT NOT NULL UNIQUE,
+                    jutsu_type TEXT NOT NULL,
+                    jutsu_description TEXT NOT NULL,
+                    record_hash TEXT NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS jutsu_fts USING fts5(
+                    jutsu_name, jutsu_type, jutsu_description,
+                    content='jutsus', content_rowid='id',
+                    tokenize='porter unicode61 remove_diacritics 2',
+                    -- Short prefixes (half-typed last words) are looked up, not expanded
+                    prefix='2 3 4'
+                );
+                -- Keep the external-content FTS table in step with jutsus
+                CREATE TRIGGER IF NOT EXISTS jutsus_insert AFTER INSERT ON jutsus BEGIN
+                    INSERT INTO jutsu_fts(rowid, jutsu_name, jutsu_type, jutsu_description)
+                    VALUES (new.id, new.jutsu_name, new.jutsu_type, new.jutsu_description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS jutsus_delete AFTER DELETE ON jutsus BEGIN
+                    INSERT INTO jutsu_fts(jutsu_fts, rowid, jutsu_name, jutsu_type, jutsu_description)
+                    VALUES ('delete', old.id, old.jutsu_name, old.jutsu_type, old.jutsu_description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS jutsus_update AFTER UPDATE ON jutsus BEGIN
+                    INSERT INTO jutsu_fts(jutsu_fts, rowid, jutsu_name, jutsu_type, jutsu_description)
+                    VALUES ('delete', old.id, old.jutsu_name, old.jutsu_type, old.jutsu_description);
+                    INSERT INTO jutsu_fts(rowid, jutsu_name, jutsu_type, jutsu_description)
+                    VALUES (new.id, new.jutsu_name, new.jutsu_type, new.jutsu_description);
+                END;
+                CREATE TABLE IF NOT EXISTS index_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                PRAGMA user_version = {SEARCH_INDEX_VERSION};
+            """)
+
+    @contextmanager
+    def connect(self):
+        # One short-lived connection per call, so instances can be shared across threads
+        connection = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_source_signature(self, jsonl_path):
+        stat = os.stat(jsonl_path)
+        return f"{os.path.abspath(jsonl_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def is_stale(self, jsonl_path=None):
+        jsonl_path = jsonl_path or self.jsonl_path
+        signature = self.get_source_signature(jsonl_path)
+        if signature == self.indexed_signature:
+            return False
+
+        with self.connect() as connection:
+            row = connection.execute("SELECT value FROM index_state WHERE key = 'source'").fetchone()
+        if row is None or row[0] != signature:
+            return True
+        self.indexed_signature = signature
+        return False
+
+    def update(self, jsonl_path=None):
+        # Incremental re-index: new and changed jutsus are written, removed ones
+        # deleted, the rest left untouched. Returns the counts.
+        jsonl_path = jsonl_path or self.jsonl_path
+        signature = self.get_source_signature(jsonl_path)
+
+        records = {}
+        with open(jsonl_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                records[record['jutsu_name']] = {
+                    'jutsu_name': record['jutsu_name'],
+                    'jutsu_type': record.get('jutsu_type') or "",
+                    'jutsu_description': record.get('jutsu_description') or "",
+                }
+
+        counts = {'new': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        with self.connect() as connection:
+            existing = dict(connection.execute("SELECT jutsu_name, record_hash FROM jutsus").fetchall())
+
+            upserts = []
+            for name, record in records.items():
+                record_hash = get_record_hash(record)
+                if existing.get(name) == record_hash:
+                    counts['unchanged'] += 1
+                    continue
+                counts['new' if name not in existing else 'changed'] += 1
+                upserts.append((name, record['jutsu_type'], record['jutsu_description'], record_hash))
+
+            removed = [(name,) for name in existing if name not in records]
+            counts['removed'] = len(removed)
+
+            connection.executemany("""
+                INSERT INTO jutsus (jutsu_name, jutsu_type, jutsu_description, record_hash) VALUES (?, ?, ?, ?)
+                ON CONFLICT(jutsu_name) DO UPDATE SET
+                    jutsu_type = excluded.jutsu_type,
+                    jutsu_description = excluded.jutsu_description,
+                    record_hash = excluded.record_hash
+            """, upserts)
+            connection.executemany("DELETE FROM jutsus WHERE jutsu_name = ?", removed)
+            connection.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES ('source', ?)", (signature,))
+
+            # Small updates are left to FTS5's automerge; a full rebuild of the
+            # index segments only pays off after a large share of rows changed
+            if len(upserts) + len(removed) > len(existing) // 10:
+                connection.execute("INSERT INTO jutsu_fts(jutsu_fts) VALUES ('optimize')")
+        self.indexed_signature = signature
+        return counts
+
+    def refresh(self):
+        # Re-indexes only when the JSONL's size or mtime changed since the last update
+        if self.jsonl_path is not None and os.path.exists(self.jsonl_path) and self.is_stale():
+            return self.update()
+        return None
+
+    def rank_matches(self, connection, match_query, limit):
+        # The best `limit` of all matches: ordering and limit are on the MATCH
+        # query itself, so SQLite keeps a top-k while scanning every match
+        weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+        ranked = connection.execute(f"""
+            SELECT rowid, bm25(jutsu_fts, {weights}) AS bm25_score
+            FROM jutsu_fts WHERE jutsu_fts MATCH ?
+            ORDER BY bm25_score LIMIT ?
+        """, (match_query, limit)).fetchall()
+        if not ranked:
+            return []
+
+        # Snippets only for the rows that are returned
+        placeholders = ",".join("?" * len(ranked))
+        details = {row[0]: row[1:] for row in connection.execute(f"""
+            SELECT jutsus.id, jutsus.jutsu_name, jutsus.jutsu_type, snippet(jutsu_fts, 2, '', '', '…', 24)
+            FROM jutsu_fts JOIN jutsus ON jutsus.id = jutsu_fts.rowid
+            WHERE jutsu_fts MATCH ? AND jutsu_fts.rowid IN ({placeholders})
+        """, [match_query] + [rowid for rowid, _ in ranked])}
+
+        results = []
+        for rowid, bm25_score in ranked:
+            jutsu_name, jutsu_type, snippet = details[rowid]
+            results.append({
+                'jutsu_name': jutsu_name,
+                'jutsu_type': jutsu_type,
+                'snippet': snippet,
+                # bm25() is lower-is-better; flipped so higher means more relevant
+                'score': -bm25_score,
+            })
+        return results
+
+    def search(self, query, limit=10, refresh=True):
+        # Ranked matches for free text like "fire release". Every word has to
+        # match; the last word is retried as a prefix, then any word is
+        # accepted, only while fewer than `limit` jutsus are found.
+        if refresh:
+            self.refresh()
+
+        results = []
+        tried = set()
+        with self.connect() as connection:
+            for match_all, prefix in ((True, False), (True, True), (False, True)):
+                match_query = build_match_query(query, match_all, prefix)
+                if match_query is None or match_query in tried:
+                    continue
+                tried.add(match_query)
+
+                matches = self.rank_matches(connection, match_query, limit)
+                if len(matches) > len(results):
+                    results = matches
+                if len(results) >= limit:
+                    break
+        return results
+
+    def get_size(self):
+        with self.connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM jutsus").fetchone()[0]
@@ -0,0 +1,34 @@
+import sys
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from character_chatbot import GeminiChatBot, LLMClient
+from character_chatbot.fake_server import FakeGeminiModel, serve_fake_gemini
+
+
+@pytest.fixture
+def fake_gemini():
+    server = serve_fake_gemini(latency_ms=40, chunks=4)
+    yield server
+    server.shutdown()
+
+
+def test_chat_stream_from_fake_model_without_genai(fake_gemini, monkeypatch):
+    # A None entry makes `import google.generativeai` raise ImportError
+    monkeypatch.setitem(sys.modules, "google.generativeai", None)
+
+    model = FakeGeminiModel(f"http://127.0.0.1:{fake_gemini.server_port}")
+    llm_client = LLMClient(model, max_retries=0, timeout_seconds=5)
+    chatbot = GeminiChatBot(model=model, use_cache=False, use_quotes=False, llm_client=llm_client)
+    try:
+        replies = list(chatbot.chat_stream("What's your dream?", [], "naruto"))
+    finally:
+        llm_client.close()
+
+    # The reply grows chunk by chunk, then comes back post-processed
+    assert len(replies) > 2
+    assert all(later.startswith(earlier.strip()) for earlier, later in zip(replies, replies[1:]))
+    assert replies[-1] == "Fake reply to: What's your dream?. Hmm, believe it!"
+    assert fake_gemini.stats['requests'] == 1
@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+import pytest
+
+from text_classification.cleaner import Cleaner
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'jutsus.jsonl')
+
+# Markup the regex fast path can't reproduce exactly; it must hand these to BeautifulSoup
+FALLBACK_CASES = [
+    "<script>var x = '<b>';</script>Rasengan",
+    "<style>p { color: red }</style>Chidori",
+    "<textarea><b>kept</b></textarea>",
+    "<title>Rasengan</title><p>Spinning chakra</p>",
+    "<table><tr><td>Rank</td><td>S</td></tr></table>",
+    "<pre>  indented\n  lines</pre>",
+    "<b>Fire</b> <i>Release</i>",
+    '<a href="/wiki/Fire>Release">Fire Release</a>',
+    "<b unclosed",
+    "<!DOCTYPE html><p>Body</p>",
+    "<?xml version='1.0'?><p>Body</p>",
+    "Ninjutsu &amp Taijutsu",
+    "&copy2024 Kishimoto",
+    "Broken &#128; character &#0; here",
+    "Line\r\nbreaks",
+    "\ufeffByte order mark",
+    "Nul\x00character",
+]
+# Markup the fast path handles itself
+FAST_CASES = [
+    "Plain description of a technique.",
+    "<p>Rasengan</p>",
+    "<div class=description><b>Jutsu</b>: Chidori<br/></div>",
+    "Shadow Clone &amp; Rasengan &mdash; &#8212; &lt;notes&gt;",
+    "<p>Rasengan<\\p><span>Rank: S</span><!-- infobox -->",
+    "  <p>Surrounding whitespace</p>  ",
+    "<P>Upper-case tags</P>",
+]
+
+
+@pytest.fixture(scope='module')
+def cleaner():
+    return Cleaner()
+
+
+def test_clean_series_matches_beautifulsoup_on_jutsus(cleaner):
+    df = pd.read_json(DATA_PATH, lines=True)
+    texts = (df['jutsu_name'] + ". " + df['jutsu_description']).dropna()
+
+    reference = [cleaner.clean(text) for text in texts]
+    cleaned = cleaner.clean_series(texts)
+
+    mismatches = [(text, expected, actual) for text, expected, actual in zip(texts, reference, cleaned)
+                  if expected != actual]
+    assert mismatches == []
+    assert cleaned.index.equals(texts.index)
+
+
+@pytest.mark.filterwarnings("ignore::bs4.XMLParsedAsHTMLWarning")
+@pytest.mark.parametrize('text', FALLBACK_CASES)
+def test_edge_cases_fall_back_to_beautifulsoup(cleaner, text):
+    assert cleaner.remove_html_tags_fast(cleaner.put_line_breaks(text)) is None
+    assert cleaner.clean_series([text]) == [cleaner.clean(text)]
+
+
+@pytest.mark.parametrize('text', FAST_CASES)
+def test_fast_path_matches_beautifulsoup(cleaner, text):
+    assert cleaner.remove_html_tags_fast(cleaner.put_line_breaks(text)) is not None
+    assert cleaner.clean_series([text]) == [cleaner.clean(text)]
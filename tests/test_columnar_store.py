@@ -0,0 +1,21 @@
+import pandas as pd
+
+from utils import read_csv_columnar
+
+
+def test_entity_column_reads_the_same_with_and_without_the_columnar_copy(tmp_path):
+    csv_path = tmp_path / "ner_output.csv"
+    pd.DataFrame({
+        'episode': [1, 2, 3],
+        'script': ["Naruto and Sasuke fight.", "Sakura heals.", ""],
+        'ners': [[{'Naruto', 'Sasuke'}, set()], [{'Sakura'}], []],
+    }).to_csv(csv_path, index=False)
+
+    first = read_csv_columnar(csv_path, entity_columns=['ners'])
+    assert (tmp_path / "ner_output.columns").exists()
+    second = read_csv_columnar(csv_path, entity_columns=['ners'])
+
+    assert first['ners'].tolist() == [[{'Naruto', 'Sasuke'}, set()], [{'Sakura'}], []]
+    assert second['ners'].tolist() == first['ners'].tolist()
+    assert [type(sentence) for row in second['ners'] for sentence in row] == [set, set, set]
+    pd.testing.assert_frame_equal(first.drop(columns=['ners']), second.drop(columns=['ners']), check_dtype=False)
@@ -0,0 +1,40 @@
+import random
+
+import pandas as pd
+
+from character_network.cooccurrence import CooccurrenceAccumulator, generate_relationship_df
+
+NAMES = ["Naruto", "Sasuke", "Sakura", "Kakashi", "Hinata", "Gaara", "Itachi", "Jiraiya"]
+
+
+def make_ners_df(num_episodes=20, sentences_per_episode=30, seed=7):
+    # Per episode, a list of per-sentence sets of names; about a third of the sentences mention nobody
+    rng = random.Random(seed)
+    rows = []
+    for episode in range(1, num_episodes + 1):
+        ners = [set(rng.sample(NAMES, rng.choice([0, 0, 1, 1, 2, 3]))) for _ in range(sentences_per_episode)]
+        rows.append({'episode': episode, 'ners': ners})
+    return pd.DataFrame(rows)
+
+
+def sorted_edges(relationship_df):
+    return relationship_df.sort_values(['source', 'target']).reset_index(drop=True)
+
+
+def test_resumed_accumulator_matches_full_corpus(tmp_path):
+    df = make_ners_df()
+    expected = generate_relationship_df(df['ners'], window=10)
+
+    # Half the corpus, saved and resumed in a new accumulator
+    accumulator = CooccurrenceAccumulator(window=10, flush_size=50)
+    assert accumulator.add_episodes(df.iloc[:10]) == 10
+    state_path = str(tmp_path / "network.npz")
+    accumulator.save(state_path)
+
+    resumed = CooccurrenceAccumulator.load(state_path)
+    # Episodes seen before the save are skipped, only the new half is counted
+    assert resumed.add_episodes(df) == 10
+    assert resumed.add_episodes(df) == 0
+
+    pd.testing.assert_frame_equal(sorted_edges(resumed.to_relationship_df()), sorted_edges(expected))
+    assert len(resumed) == len(expected)
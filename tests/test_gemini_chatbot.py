@@ -0,0 +1,56 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from character_chatbot import GeminiChatBot
+
+
+class FakeResponse():
+    def __init__(self, text):
+        self.text = text
+
+
+def make_fake_genai(calls):
+    # Records what the chatbot does with google.generativeai
+    genai = types.ModuleType("google.generativeai")
+
+    class GenerativeModel():
+        def __init__(self, model_name):
+            calls.append(('model', model_name))
+
+        def generate_content(self, prompt, generation_config=None, stream=False):
+            return FakeResponse("I'm going to be Hokage!")
+
+    genai.configure = lambda api_key: calls.append(('configure', api_key))
+    genai.GenerativeModel = GenerativeModel
+    return genai
+
+
+def test_gemini_model_is_built_on_the_first_chat(monkeypatch):
+    calls = []
+    monkeypatch.setenv('GEMINI_API_KEY', "dummy-key")
+    genai = make_fake_genai(calls)
+    monkeypatch.setitem(sys.modules, "google", types.SimpleNamespace(generativeai=genai))
+    monkeypatch.setitem(sys.modules, "google.generativeai", genai)
+
+    chatbot = GeminiChatBot(use_cache=False, use_quotes=False)
+    assert chatbot.available
+    assert calls == []
+
+    assert chatbot.chat("What's your dream?", [], "naruto").startswith("I'm going to be Hokage!")
+    assert list(chatbot.chat_stream("And your sensei?", [], "naruto"))
+    assert calls == [('configure', "dummy-key"), ('model', chatbot.model_name)]
+    chatbot.llm_client.close()
+
+
+def test_chat_reports_unavailable_when_genai_is_missing(monkeypatch):
+    monkeypatch.setenv('GEMINI_API_KEY', "dummy-key")
+    # A None entry makes `import google.generativeai` raise ImportError
+    monkeypatch.setitem(sys.modules, "google.generativeai", None)
+
+    chatbot = GeminiChatBot(use_cache=False, use_quotes=False)
+    assert chatbot.chat("What's your dream?", [], "naruto") == "Gemini chatbot not available. Please check your API key."
+    assert not chatbot.available
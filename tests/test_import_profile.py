@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("gradio")
+pytest.importorskip("dotenv")
+
+from utils.import_profile import get_deferred_imports, profile_imports
+
+
+def test_app_import_defers_heavy_modules(monkeypatch):
+    # With the key set, as in deployment, the chatbot must still not import google.generativeai
+    monkeypatch.setenv('GEMINI_API_KEY', "dummy-key")
+    timings, _ = profile_imports("app")
+
+    assert "app" in timings
+    assert get_deferred_imports(timings) == []
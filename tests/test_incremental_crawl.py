@@ -0,0 +1,69 @@
+import json
+import shutil
+
+import pytest
+
+pytest.importorskip("scrapy")
+
+from crawler.fixture_server import FIXTURES_DIR, run_crawl, serve_fixtures
+
+FIXTURE_JUTSUS = {"Shadow Clone Technique", "Rasengan", "Summoning Technique", "Chidori", "Leaf Hurricane"}
+# Two listing pages and five jutsu pages
+NUM_PAGES = 7
+
+
+def read_jutsus(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    # A copy of the fixture pages, so the test can edit one
+    fixtures_dir = tmp_path / "fixtures"
+    shutil.copytree(FIXTURES_DIR, fixtures_dir)
+    server = serve_fixtures(str(fixtures_dir))
+    yield fixtures_dir, f"http://127.0.0.1:{server.server_port}/listing-0.html"
+    server.shutdown()
+
+
+def test_recrawl_revalidates_and_merges_changed_pages(tmp_path, fixtures):
+    fixtures_dir, start_url = fixtures
+    output_path = tmp_path / "jutsus.jsonl"
+    state_dir = str(tmp_path / "state")
+    # Records from earlier crawls that the fixture site doesn't list are kept
+    earlier_record = {"jutsu_name": "Sexy Technique", "jutsu_type": "Ninjutsu", "jutsu_description": "A transformation."}
+    output_path.write_text(json.dumps(earlier_record) + "\n")
+
+    stats = run_crawl(start_url, str(output_path), state_dir)
+    assert (stats['jutsus/new'], stats['jutsus/changed'], stats['jutsus/unchanged']) == (5, 0, 0)
+    assert stats['httpcache/miss'] == NUM_PAGES
+    assert stats['httpcache/store'] == NUM_PAGES
+    first_records = read_jutsus(output_path)
+    assert first_records[0] == earlier_record
+    assert {record['jutsu_name'] for record in first_records[1:]} == FIXTURE_JUTSUS
+
+    # Nothing changed: every page is revalidated against its stored validators
+    stats = run_crawl(start_url, str(output_path), state_dir)
+    assert (stats['jutsus/new'], stats['jutsus/changed'], stats['jutsus/unchanged']) == (0, 0, 5)
+    assert stats['httpcache/revalidate'] == NUM_PAGES
+    assert 'httpcache/miss' not in stats
+    assert 'httpcache/invalidate' not in stats
+    assert read_jutsus(output_path) == first_records
+
+    page_path = fixtures_dir / "wiki" / "Leaf_Hurricane.html"
+    page_path.write_text(page_path.read_text(encoding='utf-8').replace(
+        "roundhouse kick", "roundhouse kick, sweeping the legs"), encoding='utf-8')
+
+    # Only the edited page is fetched again, and its record is replaced in place
+    stats = run_crawl(start_url, str(output_path), state_dir)
+    assert (stats['jutsus/new'], stats['jutsus/changed'], stats['jutsus/unchanged']) == (0, 1, 4)
+    assert stats['httpcache/invalidate'] == 1
+    assert stats['httpcache/revalidate'] == NUM_PAGES - 1
+
+    records = read_jutsus(output_path)
+    assert [record['jutsu_name'] for record in records] == [record['jutsu_name'] for record in first_records]
+    changed = [(before, after) for before, after in zip(first_records, records) if before != after]
+    assert len(changed) == 1
+    assert changed[0][1]['jutsu_name'] == "Leaf Hurricane"
+    assert "roundhouse kick, sweeping the legs" in changed[0][1]['jutsu_description']
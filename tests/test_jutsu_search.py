@@ -0,0 +1,28 @@
+import json
+
+from jutsu_search import JutsuSearchIndex
+
+
+def write_jutsus(path, records):
+    with open(path, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+
+
+def test_best_match_is_found_beyond_the_first_thousand(tmp_path):
+    # 1200 weak matches first, the only jutsu named after the query last
+    records = [{'jutsu_name': f"Technique {index}", 'jutsu_type': "Ninjutsu",
+                'jutsu_description': f"A long description of technique {index} that mentions fire once."}
+               for index in range(1200)]
+    records.append({'jutsu_name': "Fire Release: Great Fireball", 'jutsu_type': "Ninjutsu",
+                    'jutsu_description': "Fire is kneaded inside the body and expelled from the mouth."})
+    jsonl_path = tmp_path / "jutsus.jsonl"
+    write_jutsus(jsonl_path, records)
+
+    index = JutsuSearchIndex(tmp_path / "jutsu_search.sqlite", jsonl_path)
+    results = index.search("fire", limit=5)
+
+    assert len(results) == 5
+    assert results[0]['jutsu_name'] == "Fire Release: Great Fireball"
+    assert [result['score'] for result in results] == sorted((result['score'] for result in results), reverse=True)
+
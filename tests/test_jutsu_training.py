@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("datasets")
+pytest.importorskip("sklearn")
+
+from text_classification import JutsuClassifier
+from text_classification import training_utils
+
+JUTSU_TYPES = {
+    "Ninjutsu": "chakra fire ball wind",
+    "Genjutsu": "illusion eyes dream mind",
+    "Taijutsu": "kick punch speed strength",
+}
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "."] + " ".join(JUTSU_TYPES.values()).split()
+
+
+def write_tiny_base_model(path):
+    # A one-layer DistilBERT and a word-level vocab: enough to train in seconds, no hub needed
+    path.mkdir()
+    vocab_path = path / "vocab.txt"
+    vocab_path.write_text("\n".join(VOCAB) + "\n")
+    transformers.DistilBertTokenizerFast(vocab_file=str(vocab_path)).save_pretrained(str(path))
+    config = transformers.DistilBertConfig(vocab_size=len(VOCAB), dim=32, hidden_dim=64, n_layers=1,
+                                           n_heads=2, max_position_embeddings=64)
+    transformers.DistilBertModel(config).save_pretrained(str(path))
+
+
+def write_jutsus(path):
+    with open(path, "w") as file:
+        for jutsu_type, words in JUTSU_TYPES.items():
+            for index in range(10):
+                file.write(json.dumps({"jutsu_name": f"{jutsu_type} {index}",
+                                       "jutsu_type": jutsu_type,
+                                       "jutsu_description": f"{words} {words.split()[index % 4]}"}) + "\n")
+
+
+def compute_accuracy(eval_pred):
+    # evaluate.load('accuracy') fetches its script from the hub
+    logits, labels = eval_pred
+    return {"accuracy": float((np.argmax(logits, axis=-1) == labels).mean())}
+
+
+@pytest.mark.parametrize("training_mode", ["full", "lora"])
+def test_trained_offline_model_loads_back(tmp_path, monkeypatch, training_mode):
+    if training_mode == "lora":
+        pytest.importorskip("peft")
+    monkeypatch.setattr(training_utils, "compute_metrics", compute_accuracy)
+
+    base_model_path = tmp_path / "base"
+    write_tiny_base_model(base_model_path)
+    data_path = tmp_path / "jutsus.jsonl"
+    write_jutsus(data_path)
+    model_path = str(tmp_path / f"jutsu-{training_mode}")
+
+    trained = JutsuClassifier(model_path=model_path,
+                              data_path=str(data_path),
+                              model_name=str(base_model_path),
+                              offline=True,
+                              training_mode=training_mode,
+                              num_train_epochs=1,
+                              dataset_cache_dir=str(tmp_path / "dataset_cache"))
+    assert trained.network_calls == 0
+    assert (tmp_path / f"jutsu-{training_mode}" / "config.json").exists()
+
+    # A new classifier finds the saved model and doesn't train again
+    reloaded = JutsuClassifier(model_path=model_path, offline=True)
+    assert reloaded.resolved_model_path == model_path
+    assert reloaded.training_report is None
+    assert reloaded.network_calls == 0
+    assert reloaded.classify_jutsu("chakra fire ball")[0] in JUTSU_TYPES
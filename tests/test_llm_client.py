@@ -0,0 +1,58 @@
+import pytest
+
+# The package's __init__ imports the chatbot, which needs python-dotenv
+pytest.importorskip("dotenv")
+
+from character_chatbot.llm_client import CircuitBreaker, LLMClient
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class UpstreamError(Exception):
+    code = 503
+
+
+def open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=10, clock=clock)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.get_state() == 'open'
+    return breaker
+
+
+def test_non_retryable_error_does_not_close_a_half_open_circuit():
+    clock = FakeClock()
+    breaker = open_breaker(clock)
+    client = LLMClient(model=None, max_retries=0, circuit_breaker=breaker)
+
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.get_state() == 'half_open'
+    # e.g. a blocked prompt: the model answered, but that proves nothing about its health
+    assert client.handle_failure(ValueError("blocked prompt"), 0) is False
+    assert breaker.get_state() == 'half_open'
+
+    # The next call is the new trial, and its failure re-opens the circuit
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert client.handle_failure(UpstreamError("unavailable"), 0) is False
+    assert breaker.get_state() == 'open'
+    client.close()
+
+
+def test_non_retryable_error_resets_the_failure_streak_while_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=10, clock=FakeClock())
+    client = LLMClient(model=None, max_retries=0, circuit_breaker=breaker)
+
+    client.handle_failure(UpstreamError("unavailable"), 0)
+    client.handle_failure(ValueError("blocked prompt"), 0)
+    client.handle_failure(UpstreamError("unavailable"), 0)
+    assert breaker.get_state() == 'closed'
+    client.close()
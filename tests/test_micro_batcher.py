@@ -0,0 +1,26 @@
+import pytest
+
+from text_classification.micro_batcher import MicroBatcher
+
+TEXTS = ["rasengan", "chidori", "kage bunshin"]
+
+
+def test_each_caller_gets_its_own_result():
+    batcher = MicroBatcher(lambda texts: [text.upper() for text in texts], max_batch_size=8, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(text) for text in TEXTS]
+        assert [future.result(timeout=5) for future in futures] == [text.upper() for text in TEXTS]
+    finally:
+        batcher.close()
+
+
+def test_result_count_mismatch_fails_every_caller():
+    # One result short: no caller may hang or be handed another caller's result
+    batcher = MicroBatcher(lambda texts: [text.upper() for text in texts][:-1], max_batch_size=8, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(text) for text in TEXTS]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="2 results for 3 items"):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyvis")
+
+from character_network import CharacterNetworkGenerator
+from character_network import character_network_generator
+
+NERS = [[{'Naruto', 'Sasuke'}, {'Sakura'}, set(), {'Kakashi', 'Naruto'}]]
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr(character_network_generator, 'render_cache', character_network_generator.OrderedDict())
+    generator = CharacterNetworkGenerator()
+    # Records every full hash of the edges
+    generator.hashed = []
+    get_edges_fingerprint = generator.get_edges_fingerprint
+
+    def counting_get_edges_fingerprint(relationship_df):
+        generator.hashed.append(len(relationship_df))
+        return get_edges_fingerprint(relationship_df)
+
+    monkeypatch.setattr(generator, 'get_edges_fingerprint', counting_get_edges_fingerprint)
+    return generator
+
+
+def test_network_from_a_saved_ner_output_is_never_hashed(tmp_path, generator):
+    ner_path = tmp_path / "ner_output.csv"
+    ner_path.write_text("episode,ners\n")
+    relationship_df = generator.generate_character_network(pd.DataFrame({'ners': NERS}), source_path=str(ner_path))
+
+    html = generator.draw_network_graph(relationship_df)
+    assert generator.draw_network_graph(relationship_df) is html
+    assert generator.hashed == []
+
+
+def test_edges_are_hashed_once_per_frame_without_a_source(generator):
+    relationship_df = generator.generate_character_network(pd.DataFrame({'ners': NERS}))
+
+    html = generator.draw_network_graph(relationship_df)
+    assert generator.draw_network_graph(relationship_df) is html
+    assert generator.draw_network_graph(relationship_df, top_n=1) is not html
+    assert len(generator.hashed) == 1
@@ -0,0 +1,128 @@
+import gc
+import weakref
+
+import pandas as pd
+
+from character_network import NamedEntityRecognizer
+from theme_classifier import ThemeClassifier
+
+NUM_BATCHES = 6
+EPISODES_PER_BATCH = 3
+THEMES = ['friendship', 'battle']
+
+
+def make_tracked_batches(make_batch):
+    # Yields NUM_BATCHES DataFrames and records, at every yield, how many of the
+    # batches handed out so far are still alive somewhere
+    refs = []
+    live_counts = []
+
+    def iter_batches(*args, **kwargs):
+        for index in range(NUM_BATCHES):
+            df = make_batch(index)
+            refs.append(weakref.ref(df))
+            gc.collect()
+            live_counts.append(sum(ref() is not None for ref in refs))
+            yield df
+            del df
+
+    return iter_batches, live_counts
+
+
+def make_ner_batch(index):
+    episodes = range(index * EPISODES_PER_BATCH, (index + 1) * EPISODES_PER_BATCH)
+    return pd.DataFrame({
+        'episode': list(episodes),
+        'script': [f"Naruto meets Sasuke in episode {episode}" for episode in episodes],
+        'ners': [[{'Naruto'}, set()] for _ in episodes],
+    })
+
+
+def test_ner_streaming_holds_a_bounded_number_of_batches(tmp_path, monkeypatch):
+    recognizer = NamedEntityRecognizer()
+    iter_batches, live_counts = make_tracked_batches(make_ner_batch)
+    monkeypatch.setattr(recognizer, 'iter_ners', iter_batches)
+
+    save_path = str(tmp_path / 'ners.csv')
+    df = recognizer.get_ners('subtitles', save_path=save_path, episodes_per_batch=EPISODES_PER_BATCH)
+
+    assert len(live_counts) == NUM_BATCHES
+    assert max(live_counts) <= 2
+    assert len(df) == NUM_BATCHES * EPISODES_PER_BATCH
+    assert df['ners'].iloc[-1] == [{'Naruto'}, set()]
+    assert not (tmp_path / 'ners.csv.tmp').exists()
+
+
+def test_ner_streaming_returns_the_path_when_asked(tmp_path, monkeypatch):
+    recognizer = NamedEntityRecognizer()
+    iter_batches, live_counts = make_tracked_batches(make_ner_batch)
+    monkeypatch.setattr(recognizer, 'iter_ners', iter_batches)
+
+    save_path = str(tmp_path / 'ners.csv')
+    result = recognizer.get_ners('subtitles', save_path=save_path,
+                                 episodes_per_batch=EPISODES_PER_BATCH, return_df=False)
+
+    assert result == save_path
+    assert max(live_counts) <= 2
+    assert len(pd.read_csv(save_path)) == NUM_BATCHES * EPISODES_PER_BATCH
+
+
+def test_ner_streaming_without_save_path(monkeypatch):
+    recognizer = NamedEntityRecognizer()
+    iter_batches, live_counts = make_tracked_batches(make_ner_batch)
+    monkeypatch.setattr(recognizer, 'iter_ners', iter_batches)
+
+    df = recognizer.get_ners('subtitles', episodes_per_batch=EPISODES_PER_BATCH)
+
+    assert max(live_counts) <= 2
+    assert df['episode'].tolist() == list(range(NUM_BATCHES * EPISODES_PER_BATCH))
+    assert df['ners'].iloc[0] == [{'Naruto'}, set()]
+
+
+def make_theme_batch(index):
+    episodes = range(index * EPISODES_PER_BATCH, (index + 1) * EPISODES_PER_BATCH)
+    return pd.DataFrame({
+        'episode': list(episodes),
+        'script': [f"Naruto trains in episode {episode}" for episode in episodes],
+        'friendship': [0.25 for _ in episodes],
+        'battle': [0.75 for _ in episodes],
+    })
+
+
+def test_theme_streaming_holds_a_bounded_number_of_batches(tmp_path, monkeypatch):
+    classifier = ThemeClassifier(THEMES)
+    iter_batches, live_counts = make_tracked_batches(make_theme_batch)
+    monkeypatch.setattr(classifier, 'iter_themes', iter_batches)
+
+    save_path = str(tmp_path / 'themes.csv')
+    df = classifier.get_themes('subtitles', save_path=save_path, episodes_per_batch=EPISODES_PER_BATCH)
+
+    assert len(live_counts) == NUM_BATCHES
+    assert max(live_counts) <= 2
+    assert df.columns.tolist() == ['episode', 'script'] + THEMES
+    assert len(df) == NUM_BATCHES * EPISODES_PER_BATCH
+    assert not (tmp_path / 'themes.csv.tmp').exists()
+
+
+def test_theme_streaming_returns_the_path_when_asked(tmp_path, monkeypatch):
+    classifier = ThemeClassifier(THEMES)
+    iter_batches, live_counts = make_tracked_batches(make_theme_batch)
+    monkeypatch.setattr(classifier, 'iter_themes', iter_batches)
+
+    save_path = str(tmp_path / 'themes.csv')
+    result = classifier.get_themes('subtitles', save_path=save_path,
+                                   episodes_per_batch=EPISODES_PER_BATCH, return_df=False)
+
+    assert result == save_path
+    assert max(live_counts) <= 2
+
+
+def test_theme_streaming_without_save_path(monkeypatch):
+    classifier = ThemeClassifier(THEMES)
+    iter_batches, live_counts = make_tracked_batches(make_theme_batch)
+    monkeypatch.setattr(classifier, 'iter_themes', iter_batches)
+
+    df = classifier.get_themes('subtitles', episodes_per_batch=EPISODES_PER_BATCH)
+
+    assert max(live_counts) <= 2
+    assert df['battle'].sum() == 0.75 * NUM_BATCHES * EPISODES_PER_BATCH
@@ -0,0 +1,249 @@
+import argparse
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from .cleaner import Cleaner
+from .micro_batcher import MicroBatcher
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'jutsus.jsonl')
+
+def load_jutsu_texts(data_path, limit=None):
+    df = pd.read_json(data_path, lines=True)
+    texts = (df['jutsu_name'] + ". " + df['jutsu_description']).dropna().tolist()
+    texts = Cleaner().clean_series(texts[:limit])
+    return texts
+
+def measure_latencies(classify, texts, concurrency, num_requests):
+    # `concurrency` threads each send requests back to back until num_requests are done
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def worker(worker_index):
+        for request_index in range(worker_index, num_requests, concurrency):
+            start_time = time.perf_counter()
+            classify(texts[request_index % len(texts)])
+            elapsed = time.perf_counter() - start_time
+            with latencies_lock:
+                latencies.append(elapsed)
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start_time
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': num_requests,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'throughput_rps': num_requests / wall_time,
+    }
+
+def benchmark_micro_batching(jutsu_classifier, texts, concurrency_levels=(1, 2, 4, 8, 16, 32),
+                             num_requests=256, max_batch_size=16, max_wait_ms=5):
+    # Compares one pipeline call per request against the micro-batching front end
+    model = jutsu_classifier.model
+
+    def classify_direct(text):
+        return jutsu_classifier.postprocess(model(text))
+
+    batcher = MicroBatcher(jutsu_classifier.classify_jutsu_batch, max_batch_size, max_wait_ms)
+
+    rows = []
+    try:
+        for concurrency in concurrency_levels:
+            rows.append(dict(mode='direct', **measure_latencies(classify_direct, texts, concurrency, num_requests)))
+            rows.append(dict(mode='micro-batched', **measure_latencies(batcher, texts, concurrency, num_requests)))
+    finally:
+        batcher.close()
+
+    report_df = pd.DataFrame(rows)
+    report_df['max_batch_size'] = max_batch_size
+    report_df['max_wait_ms'] = max_wait_ms
+    return report_df
+
+def run_micro_batching(args):
+    from .jutsu_classifier import JutsuClassifier
+
+    jutsu_classifier = JutsuClassifier(model_path=args.model_path)
+    texts = load_jutsu_texts(args.data_path, limit=512)
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+
+    report_df = benchmark_micro_batching(jutsu_classifier, texts, concurrency_levels, args.requests,
+                                         args.max_batch_size, args.max_wait_ms)
+    print(report_df.to_string(index=False, float_format=lambda value: f"{value:.1f}"))
+
+def get_serialized_size(model):
+    import io
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+def time_predictions(jutsu_classifier, texts, batch_size):
+    predictions = []
+    start_time = time.perf_counter()
+    for index in range(0, len(texts), batch_size):
+        predictions.extend(jutsu_classifier.classify_jutsu_batch(texts[index:index+batch_size]))
+    elapsed = time.perf_counter() - start_time
+    return predictions, elapsed * 1000 / len(texts)
+
+def benchmark_quantization(model_path, data_path, batch_sizes=(1, 16)):
+    # fp32 pipeline vs dynamic int8 on the held-out split produced by load_data
+    from .jutsu_classifier import JutsuClassifier
+
+    reference = JutsuClassifier(model_path=model_path, backend="pytorch")
+    test_data = reference.load_data(data_path)[1]
+    texts = test_data['text_cleaned']
+    gold = [reference.label_dict[label] for label in test_data['label']]
+
+    rows = []
+    predictions_by_backend = {}
+    for backend in ("pytorch", "int8"):
+        jutsu_classifier = reference if backend == "pytorch" else JutsuClassifier(model_path=model_path, backend=backend)
+
+        row = {
+            'backend': backend,
+            'model_mb': get_serialized_size(jutsu_classifier.model.model) / 2**20,
+        }
+        for batch_size in batch_sizes:
+            predictions, ms_per_text = time_predictions(jutsu_classifier, texts, batch_size)
+            row[f'ms_per_text_batch{batch_size}'] = ms_per_text
+        predictions_by_backend[backend] = predictions
+        row['accuracy'] = float(np.mean([prediction == label for prediction, label in zip(predictions, gold)]))
+        rows.append(row)
+
+    report_df = pd.DataFrame(rows)
+    report_df['agreement_with_fp32'] = [
+        float(np.mean([a == b for a, b in zip(predictions_by_backend[backend], predictions_by_backend['pytorch'])]))
+        for backend in report_df['backend']
+    ]
+    return report_df
+
+def run_quantization(args):
+    report_df = benchmark_quantization(args.model_path, args.data_path)
+    print(report_df.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+def get_html_variants(texts):
+    # The crawl output is mostly plain text; these exercise tags, comments and entities as well
+    templates = [
+        "<p>{}</p>",
+        "<div class=description><b>Jutsu</b>: {}<br/></div>",
+        "{} &amp; more &mdash; &#8212; &lt;notes&gt;",
+        "<p>{}<\\p><span>Rank: S</span><!-- infobox -->",
+        "<p>{}</p>\n<script>var x = 1;</script><p>See also</p>",
+    ]
+    return [templates[index % len(templates)].format(text) for index, text in enumerate(texts)]
+
+def time_cleaning(clean, texts, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        clean(texts)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+def benchmark_cleaner(texts, num_workers=(1, 4)):
+    cleaner = Cleaner()
+    rows = []
+    for corpus, corpus_texts in (('jutsus', texts), ('html', get_html_variants(texts))):
+        reference = [cleaner.clean(text) for text in corpus_texts]
+        mismatches = sum(a != b for a, b in zip(reference, cleaner.clean_series(corpus_texts)))
+        fast_path = sum(cleaner.remove_html_tags_fast(cleaner.put_line_breaks(text)) is not None for text in corpus_texts)
+
+        reference_seconds = time_cleaning(lambda values: [cleaner.clean(text) for text in values], corpus_texts)
+        rows.append({'corpus': corpus, 'cleaner': 'beautifulsoup', 'workers': 1,
+                     'texts_per_second': len(corpus_texts) / reference_seconds, 'speedup': 1.0,
+                     'mismatches': 0, 'fast_path_share': 0.0})
+        for workers in num_workers:
+            seconds = time_cleaning(lambda values: cleaner.clean_series(values, num_workers=workers), corpus_texts)
+            rows.append({'corpus': corpus, 'cleaner': 'clean_series', 'workers': workers,
+                         'texts_per_second': len(corpus_texts) / seconds, 'speedup': reference_seconds / seconds,
+                         'mismatches': mismatches, 'fast_path_share': fast_path / len(corpus_texts)})
+    return pd.DataFrame(rows)
+
+def run_cleaner(args):
+    df = pd.read_json(args.data_path, lines=True)
+    texts = (df['jutsu_name'] + ". " + df['jutsu_description']).dropna().tolist()
+    texts = texts * args.repeat
+
+    report_df = benchmark_cleaner(texts, [int(workers) for workers in args.workers.split(',')])
+    print(report_df.to_string(index=False, float_format=lambda value: f"{value:.2f}"))
+    if report_df['mismatches'].any():
+        raise SystemExit("clean_series output differs from Cleaner.clean")
+
+def train_and_report(training_mode, data_path, model_dir, num_train_epochs):
+    # Runs in its own process so the peak RSS belongs to this training mode alone
+    import resource
+    from .jutsu_classifier import JutsuClassifier
+
+    jutsu_classifier = JutsuClassifier(model_path=os.path.join(model_dir, f"jutsu_classifier_{training_mode}"),
+                                       data_path=data_path,
+                                       offline=True,
+                                       training_mode=training_mode,
+                                       num_train_epochs=num_train_epochs)
+    report = dict(jutsu_classifier.training_report)
+    # ru_maxrss is in kilobytes on Linux
+    report['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return report
+
+def benchmark_training(data_path, num_train_epochs=1, training_modes=("full", "lora")):
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    rows = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        for training_mode in training_modes:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                rows.append(executor.submit(train_and_report, training_mode, data_path, model_dir, num_train_epochs).result())
+
+    report_df = pd.DataFrame(rows)
+    report_df['trainable_share'] = report_df['trainable_parameters'] / report_df['total_parameters']
+    return report_df
+
+def run_training(args):
+    report_df = benchmark_training(args.data_path, args.epochs, args.modes.split(','))
+    print(report_df.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Jutsu classifier benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    micro_batching = subparsers.add_parser('micro-batching', help="p50/p99 latency and throughput under concurrent load")
+    micro_batching.add_argument('--model-path', default="vaishnaviiii34/jutsu_classifier")
+    micro_batching.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    micro_batching.add_argument('--concurrency', default="1,2,4,8,16,32")
+    micro_batching.add_argument('--requests', type=int, default=256)
+    micro_batching.add_argument('--max-batch-size', type=int, default=16)
+    micro_batching.add_argument('--max-wait-ms', type=float, default=5)
+    micro_batching.set_defaults(run=run_micro_batching)
+
+    quantization = subparsers.add_parser('quantization', help="fp32 vs int8 latency, memory and label agreement")
+    quantization.add_argument('--model-path', default="vaishnaviiii34/jutsu_classifier")
+    quantization.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    quantization.set_defaults(run=run_quantization)
+
+    cleaner = subparsers.add_parser('cleaner', help="clean_series vs BeautifulSoup: equivalence and texts/second")
+    cleaner.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    cleaner.add_argument('--repeat', type=int, default=1, help="replicate the corpus to simulate a larger crawl")
+    cleaner.add_argument('--workers', default="1,4")
+    cleaner.set_defaults(run=run_cleaner)
+
+    training = subparsers.add_parser('training', help="full fine-tuning vs LoRA: accuracy, wall time and peak memory")
+    training.add_argument('--data-path', default=DEFAULT_DATA_PATH)
+    training.add_argument('--epochs', type=int, default=1)
+    training.add_argument('--modes', default="full,lora")
+    training.set_defaults(run=run_training)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == '__main__':
+    main()
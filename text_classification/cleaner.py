@@ -1,11 +1,36 @@
+import html
+import re
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
 from bs4 import BeautifulSoup
+
+# Comments and plain tags (no quoted attributes) are removed with regexes;
+# anything the regexes can't reproduce exactly goes through BeautifulSoup.
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+TAG_PATTERN = re.compile(r"</?([A-Za-z][A-Za-z0-9]*)(?:\s[^<>\"']*)?/?>")
+MARKUP_PATTERN = re.compile(r"<[A-Za-z/!?]")
+# lxml drops or rewrites whitespace-only text between two elements
+BLANK_NODE_PATTERN = re.compile(r">\s+<")
+ENTITY_PATTERN = re.compile(r"&(?:[A-Za-z][A-Za-z0-9]*;|#[0-9]{1,7};|#[xX][0-9a-fA-F]{1,6};)")
+# Leftover '&' that html.unescape and lxml may decode differently (no ';', odd code points)
+UNSAFE_ENTITY_PATTERN = re.compile(r"&(?:[A-Za-z#])")
+UNSAFE_CHARACTERS_PATTERN = re.compile("[\x00\r\ufeff\x80-\x9f]")
+# Elements whose content lxml drops or keeps as raw text, and elements whose
+# surrounding whitespace lxml rearranges
+FALLBACK_TAGS = {
+    "script", "style", "template", "textarea", "title", "xmp", "plaintext", "iframe",
+    "noembed", "noframes", "noscript", "html", "head", "body", "table", "thead", "tbody",
+    "tfoot", "tr", "td", "th", "caption", "colgroup", "col", "select", "option", "optgroup",
+    "frameset", "frame", "math", "svg", "pre", "listing", "meta", "link", "base",
+}
+
 class Cleaner():
     def __init__(self):
-        pass 
-    
+        pass
+
     def put_line_breaks(self, text):
         return text.replace(r"<\p>", r"<\p>\n")
-    
+
     def remove_html_tags(self, text):
         clean_text = BeautifulSoup(text, "lxml").text
         return clean_text
@@ -14,4 +39,58 @@ class Cleaner():
         text = self.put_line_breaks(text)
         text = self.remove_html_tags(text)
         text = text.strip()
-        return text
\ No newline at end of file
+        return text
+
+    def remove_html_tags_fast(self, text):
+        # Returns None when the text needs the full HTML parser
+        if UNSAFE_CHARACTERS_PATTERN.search(text):
+            return None
+
+        if "<" in text:
+            if BLANK_NODE_PATTERN.search(text):
+                return None
+            text = COMMENT_PATTERN.sub("", text)
+            for match in TAG_PATTERN.finditer(text):
+                if match.group(1).lower() in FALLBACK_TAGS:
+                    return None
+            text = TAG_PATTERN.sub("", text)
+            if MARKUP_PATTERN.search(text):
+                return None
+
+        if "&" in text:
+            if UNSAFE_ENTITY_PATTERN.search(ENTITY_PATTERN.sub("", text)):
+                return None
+            for entity in ENTITY_PATTERN.findall(text):
+                character = html.unescape(entity)
+                if entity.startswith("&#") and (character == "\ufffd" or not character.isprintable()):
+                    return None
+            text = html.unescape(text)
+        return text
+
+    def clean_fast(self, text):
+        # Same output as clean() without building a DOM for every text
+        line_broken = self.put_line_breaks(text)
+        clean_text = self.remove_html_tags_fast(line_broken)
+        if clean_text is None:
+            return self.clean(text)
+        return clean_text.strip()
+
+    def clean_batch(self, texts):
+        return [self.clean_fast(text) for text in texts]
+
+    def clean_series(self, texts, num_workers=1, batch_size=2000):
+        # Cleans a Series or list; large corpora can be split across a process pool
+        values = texts.tolist() if isinstance(texts, pd.Series) else list(texts)
+
+        if num_workers is None or num_workers <= 1 or len(values) <= batch_size:
+            cleaned = self.clean_batch(values)
+        else:
+            batches = [values[index:index+batch_size] for index in range(0, len(values), batch_size)]
+            cleaned = []
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                for batch in executor.map(self.clean_batch, batches):
+                    cleaned.extend(batch)
+
+        if isinstance(texts, pd.Series):
+            return pd.Series(cleaned, index=texts.index, name=texts.name)
+        return cleaned
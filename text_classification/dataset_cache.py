@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import shutil
+
+# Bump when cleaning, label encoding or tokenization in load_data changes,
+# so splits written by the old preprocessing are no longer hit
+DATASET_CACHE_VERSION = 1
+
+def get_file_hash(path, chunk_size=1 << 20):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def get_tokenizer_fingerprint(tokenizer):
+    # Name, vocabulary and truncation length are what change the input ids
+    return json.dumps({
+        'class': type(tokenizer).__name__,
+        'name_or_path': tokenizer.name_or_path,
+        'vocab_size': len(tokenizer),
+        'model_max_length': tokenizer.model_max_length,
+    }, sort_keys=True)
+
+class TokenizedDatasetCache():
+    # Cleaned, tokenized train/test splits saved with save_to_disk, one
+    # directory per (data file content, tokenizer, split settings)
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, data_path, tokenizer, **split_settings):
+        hasher = hashlib.sha256()
+        hasher.update(f"{DATASET_CACHE_VERSION}\0{get_file_hash(data_path)}\0".encode('utf-8'))
+        hasher.update(get_tokenizer_fingerprint(tokenizer).encode('utf-8'))
+        hasher.update(json.dumps(split_settings, sort_keys=True).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        # Returns (train, test, label_dict), or None on a miss
+        path = self.get_path(key)
+        label_dict_path = os.path.join(path, 'label_dict.json')
+        if not os.path.exists(label_dict_path):
+            return None
+
+        from datasets import load_from_disk
+        try:
+            with open(label_dict_path, 'r', encoding='utf-8') as file:
+                label_dict = {int(index): label for index, label in json.load(file).items()}
+            splits = load_from_disk(path)
+        except (OSError, ValueError):
+            return None
+        return splits['train'], splits['test'], label_dict
+
+    def set(self, key, train_dataset, test_dataset, label_dict):
+        path = self.get_path(key)
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+        from datasets import DatasetDict
+        DatasetDict({'train': train_dataset, 'test': test_dataset}).save_to_disk(tmp_path)
+        # Written last: its presence marks a complete entry
+        with open(os.path.join(tmp_path, 'label_dict.json'), 'w', encoding='utf-8') as file:
+            json.dump(label_dict, file)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
@@ -1,19 +1,115 @@
 import pandas as pd
-import torch
-import huggingface_hub
-from transformers import (AutoTokenizer,
-                          AutoModelForSequenceClassification,
-                          DataCollatorWithPadding,
-                          TrainingArguments,
-                          pipeline
-            )
-from sklearn import preprocessing
-from sklearn.model_selection import train_test_split
-from datasets import Dataset
 import gc
+import time
+import threading
 from .cleaner import Cleaner
-from .training_utils import get_class_weights,compute_metrics
-from .custom_trainer import CustomTrainer
+from .micro_batcher import MicroBatcher
+from .dataset_cache import TokenizedDatasetCache
+import os
+import sys
+import pathlib
+
+folder_path = pathlib.Path(__file__).parent.resolve()
+sys.path.append(os.path.join(folder_path,'../'))
+from utils import model_registry
+
+# torch, transformers and huggingface_hub are imported where they are first
+# needed, and the training stack (sklearn, datasets, evaluate, Trainer) only
+# when a model is trained, so importing this module (and the app) stays fast
+
+# (model_path, local_model_dir, offline) -> resolved local dir / hub id, or None when
+# the model has to be trained. Memoized so repeated constructions in a process
+# never repeat the lookup (and its network round trip).
+resolved_model_paths = {}
+# Tokens already passed to huggingface_hub.login(); the login holds for the whole process
+logged_in_tokens = set()
+
+micro_batchers = {}
+micro_batchers_lock = threading.Lock()
+
+def find_local_model(model_path, local_model_dir=None):
+    candidates = [model_path]
+    if local_model_dir:
+        candidates.append(os.path.join(local_model_dir, model_path))
+        candidates.append(os.path.join(local_model_dir, model_path.replace('/', '--')))
+
+    for candidate in candidates:
+        if os.path.isfile(os.path.join(candidate, 'config.json')):
+            return candidate
+    return None
+
+def is_local_model(model_path):
+    # A directory is read from disk; anything else is a hub id and is fetched from the hub
+    return os.path.isdir(model_path)
+
+def find_cached_model(model_path):
+    # Snapshot already in the Hugging Face cache; local_files_only never touches the network
+    import huggingface_hub
+    try:
+        return huggingface_hub.snapshot_download(model_path, local_files_only=True)
+    except Exception:
+        return None
+
+INFERENCE_BACKENDS = ("pytorch", "int8")
+
+TRAINING_MODES = ("full", "lora")
+# Heads created fresh on top of the pretrained encoder; trained in full next to the adapters
+LORA_MODULES_TO_SAVE = ("pre_classifier", "classifier", "score")
+
+def get_lora_model(model, lora_rank=8, lora_alpha=16, lora_dropout=0.1):
+    # peft is an optional dependency, only needed for training_mode="lora"
+    try:
+        from peft import LoraConfig, TaskType, get_peft_model
+    except ImportError as e:
+        raise ImportError("training_mode='lora' requires peft (pip install peft>=0.8.0)") from e
+
+    module_names = {name for name, _ in model.named_children()}
+    lora_config = LoraConfig(task_type=TaskType.SEQ_CLS,
+                             r=lora_rank,
+                             lora_alpha=lora_alpha,
+                             lora_dropout=lora_dropout,
+                             modules_to_save=[name for name in LORA_MODULES_TO_SAVE if name in module_names])
+    return get_peft_model(model, lora_config)
+
+def count_parameters(model):
+    trainable = sum(parameter.numel() for parameter in model.parameters() if parameter.requires_grad)
+    total = sum(parameter.numel() for parameter in model.parameters())
+    return trainable, total
+
+def load_int8_pipeline(model_path):
+    # Dynamic int8 quantization of every Linear layer for CPU inference;
+    # labels come from the same config, so postprocess is unchanged
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    quantized_model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    return pipeline('text-classification', model=quantized_model, tokenizer=tokenizer, top_k=None, device='cpu')
+
+def load_text_classification_pipeline(model_path, backend="pytorch", on_hub_load=None):
+    from transformers import pipeline
+
+    # on_hub_load is called when the registry has no copy and model_path is a
+    # hub id, i.e. when loading the pipeline goes to the network
+    def load(loader):
+        if on_hub_load is not None and not is_local_model(model_path):
+            on_hub_load()
+        return loader()
+
+    # Shared across classifier instances through the process-wide registry
+    if backend == "int8":
+        return model_registry.get(
+            ("text-classification", model_path, "int8"),
+            lambda: load(lambda: load_int8_pipeline(model_path))
+        )
+
+    # Updated from return_all_scores=True to top_k=None (new transformers syntax)
+    return model_registry.get(
+        ("text-classification", model_path),
+        lambda: load(lambda: pipeline('text-classification', model=model_path, top_k=None))
+    )
 
 class JutsuClassifier():
     def __init__(self,
@@ -24,8 +120,35 @@ class JutsuClassifier():
                  model_name = "distilbert/distilbert-base-uncased",
                  test_size=0.2,
                  num_labels=3,
-                 huggingface_token = None
+                 huggingface_token = None,
+                 offline = None,
+                 local_model_dir = None,
+                 micro_batching = False,
+                 max_batch_size = 16,
+                 max_wait_ms = 5,
+                 backend = "pytorch",
+                 split_seed = 1234,
+                 dataset_cache_dir = None,
+                 training_mode = "full",
+                 num_train_epochs = 5,
+                 lora_rank = 8,
+                 lora_alpha = 16,
+                 lora_dropout = 0.1
                  ):
+        start_time = time.perf_counter()
+
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend {backend}, expected one of {INFERENCE_BACKENDS}")
+        self.backend = backend
+
+        if training_mode not in TRAINING_MODES:
+            raise ValueError(f"Unknown training mode {training_mode}, expected one of {TRAINING_MODES}")
+        self.training_mode = training_mode
+        self.num_train_epochs = num_train_epochs
+        self.lora_rank = lora_rank
+        self.lora_alpha = lora_alpha
+        self.lora_dropout = lora_dropout
+        self.training_report = None
         
         self.model_path = model_path
         self.data_path = data_path
@@ -34,15 +157,34 @@ class JutsuClassifier():
         self.model_name = model_name
         self.test_size = test_size
         self.num_labels = num_labels
+        self.split_seed = split_seed
+        # Tokenized splits are reused across training runs; defaults to a directory next to the data
+        if dataset_cache_dir is None:
+            dataset_cache_dir = os.getenv('JUTSU_DATASET_CACHE_DIR')
+        if dataset_cache_dir is None and data_path is not None:
+            dataset_cache_dir = os.path.join(os.path.dirname(os.path.abspath(data_path)), 'jutsu_dataset_cache')
+        self.dataset_cache_dir = dataset_cache_dir
+        import torch
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
 
+        # Offline mode resolves everything from disk and never calls the hub
+        if offline is None:
+            offline = os.getenv('HF_HUB_OFFLINE', '0').lower() in ('1', 'true', 'yes')
+        self.offline = offline
+        self.local_model_dir = local_model_dir if local_model_dir is not None else os.getenv('JUTSU_MODEL_DIR')
+        self.network_calls = 0
+
         self.huggingface_token = huggingface_token
-        if self.huggingface_token is not None:
+        if self.huggingface_token is not None and not self.offline and self.huggingface_token not in logged_in_tokens:
+            import huggingface_hub
             huggingface_hub.login(self.huggingface_token)
-        
+            logged_in_tokens.add(self.huggingface_token)
+            self.network_calls += 1
+
+        self.resolved_model_path = self.resolve_model_path()
         self.tokenizer = self.load_tokenizer()
 
-        if not huggingface_hub.repo_exists(self.model_path):
+        if self.resolved_model_path is None:
 
             # check if the data path is provided
             if data_path is None:
@@ -53,34 +195,82 @@ class JutsuClassifier():
             test_data_df = test_data.to_pandas()
 
             all_data = pd.concat([train_data_df, test_data_df]).reset_index(drop=True)
+            from .training_utils import get_class_weights
             class_weights = get_class_weights(all_data)
 
             self.train_model(train_data, test_data, class_weights)
 
-        self.model = self.load_model(self.model_path)
+            # Drop any pipeline loaded from this path before training
+            model_registry.evict(("text-classification", self.model_path))
+            model_registry.evict(("text-classification", self.model_path, "int8"))
+            model_registry.evict(("text-classification", self.model_path, "tokenizer"))
+            for key in [key for key in resolved_model_paths if key[0] == self.model_path]:
+                del resolved_model_paths[key]
+            self.resolved_model_path = self.model_path
+
+        self.model = self.load_model(self.resolved_model_path)
+        self.micro_batcher = self.get_micro_batcher(max_batch_size, max_wait_ms) if micro_batching else None
+
+        self.construction_seconds = time.perf_counter() - start_time
+        print(f"JutsuClassifier ready in {self.construction_seconds:.2f}s "
+              f"({self.network_calls} network calls, offline={self.offline}, model={self.resolved_model_path})")
+
+    def resolve_model_path(self):
+        key = (self.model_path, self.local_model_dir, self.offline)
+        if key in resolved_model_paths:
+            return resolved_model_paths[key]
+
+        resolved = find_local_model(self.model_path, self.local_model_dir)
+        if resolved is None and self.offline:
+            resolved = find_cached_model(self.model_path)
+        if resolved is None and not self.offline:
+            import huggingface_hub
+            self.network_calls += 1
+            if huggingface_hub.repo_exists(self.model_path):
+                resolved = self.model_path
+
+        resolved_model_paths[key] = resolved
+        return resolved
+
+    def count_network_call(self):
+        self.network_calls += 1
 
     def load_model(self,model_path):
-        # Updated from return_all_scores=True to top_k=None (new transformers syntax)
-        model = pipeline('text-classification', model=model_path, top_k=None)
+        model = load_text_classification_pipeline(model_path, self.backend, on_hub_load=self.count_network_call)
         return model
 
     def train_model(self, train_data,test_data,class_weights):
+        import torch
+        from transformers import AutoModelForSequenceClassification, DataCollatorWithPadding, TrainingArguments
+        from .custom_trainer import CustomTrainer
+        from .training_utils import compute_metrics
+
         model = AutoModelForSequenceClassification.from_pretrained(self.model_name, 
                                                                    num_labels=self.num_labels,
                                                                    id2label=self.label_dict,
                                                                    )
+        lora = self.training_mode == "lora"
+        if lora:
+            # Only the adapter matrices and the classification head are trained
+            model = get_lora_model(model, self.lora_rank, self.lora_alpha, self.lora_dropout)
+        trainable_parameters, total_parameters = count_parameters(model)
+
         data_collator = DataCollatorWithPadding(tokenizer=self.tokenizer)
 
         training_args = TrainingArguments(
-            output_dir = self.model_path,
-            learning_rate=2e-4,
+            # LoRA checkpoints hold the adapters only; the merged model is written to model_path below
+            output_dir = self.model_path + "-lora" if lora else self.model_path,
+            learning_rate=1e-3 if lora else 2e-4,
             per_device_train_batch_size=8,
             per_device_eval_batch_size=8,
-            num_train_epochs=5,
+            num_train_epochs=self.num_train_epochs,
             weight_decay=0.01,
             evaluation_strategy="epoch",
             logging_strategy="epoch",
-            push_to_hub=True,
+            # Batches of similar length need far less padding
+            group_by_length=True,
+            length_column_name='length',
+            push_to_hub=not self.offline and not lora,
         )
 
         trainer = CustomTrainer(
@@ -96,7 +286,40 @@ class JutsuClassifier():
         trainer.set_device(self.device)
         trainer.set_class_weights(class_weights)
 
+        start_time = time.perf_counter()
         trainer.train()
+        train_seconds = time.perf_counter() - start_time
+        eval_metrics = trainer.evaluate()
+
+        if lora:
+            # Adapter-only copy for later fine-tuning, merged weights for inference
+            model.save_pretrained(training_args.output_dir)
+            merged_model = model.merge_and_unload()
+            merged_model.save_pretrained(self.model_path)
+            self.tokenizer.save_pretrained(self.model_path)
+            if not self.offline:
+                merged_model.push_to_hub(self.model_path)
+                self.tokenizer.push_to_hub(self.model_path)
+                self.network_calls += 2
+            del merged_model
+        else:
+            # Saved to model_path in every mode, so the model loads back offline too
+            trainer.save_model(self.model_path)
+            self.tokenizer.save_pretrained(self.model_path)
+            if not self.offline:
+                trainer.push_to_hub()
+                self.network_calls += 1
+
+        self.training_report = {
+            'training_mode': self.training_mode,
+            'trainable_parameters': trainable_parameters,
+            'total_parameters': total_parameters,
+            'train_seconds': train_seconds,
+            'eval_accuracy': eval_metrics.get('eval_accuracy'),
+            'eval_loss': eval_metrics.get('eval_loss'),
+        }
+        print(f"Trained ({self.training_mode}) {trainable_parameters:,}/{total_parameters:,} parameters "
+              f"in {train_seconds:.1f}s, eval accuracy {self.training_report['eval_accuracy']}")
 
         # Flush Memory
         del trainer,model
@@ -114,9 +337,35 @@ class JutsuClassifier():
             return "Taijutsu"
     
     def preprocess_function(self,tokenizer,examples):
-        return tokenizer(examples['text_cleaned'],truncation=True)
+        tokenized = tokenizer(examples['text_cleaned'],truncation=True)
+        tokenized['length'] = [len(input_ids) for input_ids in tokenized['input_ids']]
+        return tokenized
 
     def load_data(self,data_path):
+        if self.dataset_cache_dir is None:
+            return self.preprocess_data(data_path)
+
+        dataset_cache = TokenizedDatasetCache(self.dataset_cache_dir)
+        key = dataset_cache.get_key(data_path, self.tokenizer,
+                                    text_column_name=self.text_column_name,
+                                    label_column_name=self.label_column_name,
+                                    test_size=self.test_size,
+                                    split_seed=self.split_seed)
+        cached = dataset_cache.get(key)
+        if cached is not None:
+            tokenized_train, tokenized_test, self.label_dict = cached
+            print(f"Loaded tokenized splits from {dataset_cache.get_path(key)}")
+            return tokenized_train, tokenized_test
+
+        tokenized_train, tokenized_test = self.preprocess_data(data_path)
+        dataset_cache.set(key, tokenized_train, tokenized_test, self.label_dict)
+        return tokenized_train, tokenized_test
+
+    def preprocess_data(self,data_path):
+        from sklearn import preprocessing
+        from sklearn.model_selection import train_test_split
+        from datasets import Dataset
+
         df = pd.read_json(data_path,lines=True)
         df['jutsu_type_simplified'] = df['jutsu_type'].apply(self.simplify_jutsu)
         df['text'] = df['jutsu_name'] + ". " + df['jutsu_description']
@@ -126,7 +375,7 @@ class JutsuClassifier():
 
         # Clean Text
         cleaner = Cleaner()
-        df['text_cleaned'] = df[self.text_column_name].apply(cleaner.clean)
+        df['text_cleaned'] = cleaner.clean_series(df[self.text_column_name])
 
         # Encode Labels 
         le = preprocessing.LabelEncoder()
@@ -137,10 +386,10 @@ class JutsuClassifier():
         df['label'] = le.transform(df[self.label_column_name].tolist())
 
         # Train / Test Split
-        test_size = 0.2
         df_train, df_test = train_test_split(df, 
-                                            test_size=test_size, 
-                                            stratify=df['label'],)
+                                            test_size=self.test_size, 
+                                            stratify=df['label'],
+                                            random_state=self.split_seed)
         
         # Conver Pandas to a hugging face dataset
         train_dataset = Dataset.from_pandas(df_train)
@@ -155,20 +404,57 @@ class JutsuClassifier():
         return tokenized_train, tokenized_test
 
     def load_tokenizer(self):
-        if huggingface_hub.repo_exists(self.model_path):
-            tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-        else:
-            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        from transformers import AutoTokenizer
+
+        tokenizer_path = self.resolved_model_path if self.resolved_model_path is not None else self.model_name
+        local = is_local_model(tokenizer_path)
+
+        def load():
+            # A local directory never needs the hub, even when not in offline mode
+            if not local:
+                self.count_network_call()
+            return AutoTokenizer.from_pretrained(tokenizer_path, local_files_only=self.offline or local)
+
+        # Kept in the registry next to the pipeline of the same path, so a new
+        # classifier for an already loaded model doesn't read the tokenizer again
+        tokenizer = model_registry.get(("text-classification", tokenizer_path, "tokenizer"), load)
         return tokenizer
 
-    def postprocess(self,model_output):
+    @staticmethod
+    def postprocess(model_output):
         output=[]
         for pred in model_output:
             label = max(pred, key=lambda x: x['score'])['label']
             output.append(label)
         return output
 
+    def classify_jutsu_batch(self,texts):
+        model_output = self.model(list(texts), batch_size=len(texts))
+        predictions =self.postprocess(model_output)
+        return predictions
+
+    def get_micro_batcher(self, max_batch_size, max_wait_ms):
+        # One batcher per loaded model, shared by every classifier instance using it.
+        # The batch function looks the pipeline up in the registry on every batch
+        # rather than holding on to it, so registry eviction still frees it.
+        model_path = self.resolved_model_path
+        backend = self.backend
+        key = (model_path, backend, max_batch_size, max_wait_ms)
+
+        def classify_batch(texts):
+            model = load_text_classification_pipeline(model_path, backend)
+            return JutsuClassifier.postprocess(model(list(texts), batch_size=len(texts)))
+
+        with micro_batchers_lock:
+            if key not in micro_batchers:
+                micro_batchers[key] = MicroBatcher(classify_batch, max_batch_size, max_wait_ms)
+            return micro_batchers[key]
+
     def classify_jutsu(self,text):
+        # Concurrent single-text requests are run together as one padded batch
+        if self.micro_batcher is not None and isinstance(text, str):
+            return [self.micro_batcher.submit(text).result()]
+
         model_output = self.model(text)
         predictions =self.postprocess(model_output)
         return predictions
\ No newline at end of file
@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class MicroBatcher():
+    # Collects requests that arrive within max_wait_ms of the first one (up to
+    # max_batch_size) and runs them through batch_function as one batch.
+    # batch_function takes a list of items and returns one result per item;
+    # each caller gets its own result through a Future.
+    def __init__(self, batch_function, max_batch_size=16, max_wait_ms=5):
+        self.batch_function = batch_function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.worker = None
+        self.closed = False
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch_size_seen': 0}
+
+    def start(self):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name="jutsu-micro-batcher", daemon=True)
+                self.worker.start()
+
+    def submit(self, item):
+        if self.closed:
+            raise RuntimeError("MicroBatcher is closed")
+        self.start()
+
+        future = Future()
+        self.requests.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def collect_batch(self):
+        first = self.requests.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Close was requested: finish this batch, then stop
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect_batch()
+            if batch is None:
+                return
+
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['max_batch_size_seen'] = max(self.stats['max_batch_size_seen'], len(batch))
+
+            try:
+                results = list(self.batch_function(items))
+                if len(results) != len(futures):
+                    raise RuntimeError(f"batch_function returned {len(results)} results for {len(futures)} items")
+            except Exception as e:
+                # No caller may be left waiting, nor get another caller's result
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def close(self):
+        self.closed = True
+        if self.worker is not None and self.worker.is_alive():
+            self.requests.put(None)
+            self.worker.join()
@@ -1,15 +1,21 @@
-from sklearn.utils.class_weight import compute_class_weight
+import functools
 import numpy as np
-import evaluate
 
-metric = evaluate.load('accuracy')
+@functools.lru_cache(maxsize=None)
+def get_metric():
+    # evaluate.load fetches the metric script from the hub; done on the first
+    # evaluation instead of whenever this module is imported
+    import evaluate
+    return evaluate.load('accuracy')
 
 def compute_metrics(eval_pred):
     logits, labels = eval_pred
     predictions = np.argmax(logits, axis=-1)
-    return metric.compute(predictions=predictions, references=labels)
+    return get_metric().compute(predictions=predictions, references=labels)
 
 def get_class_weights(df):
+    from sklearn.utils.class_weight import compute_class_weight
+
     class_weights = compute_class_weight("balanced",
                          classes=np.unique(df['label']),  # numpy array
                          y=df['label'].values  # numpy array
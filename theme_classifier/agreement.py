@@ -0,0 +1,65 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from .theme_classifier import ThemeClassifier
+
+def compare_theme_scores(reference_df, candidate_df, theme_list):
+    # Agreement of a candidate backend with the reference (NLI) scores on the same episodes
+    merged = reference_df[['episode'] + theme_list].merge(
+        candidate_df[['episode'] + theme_list], on='episode', suffixes=('_reference', '_candidate'))
+
+    rows = []
+    for theme in theme_list:
+        reference = merged[f"{theme}_reference"]
+        candidate = merged[f"{theme}_candidate"]
+        rows.append({
+            'theme': theme,
+            'spearman': reference.corr(candidate, method='spearman'),
+            'pearson': reference.corr(candidate, method='pearson'),
+        })
+    per_theme_df = pd.DataFrame(rows)
+
+    reference_scores = merged[[f"{theme}_reference" for theme in theme_list]].to_numpy()
+    candidate_scores = merged[[f"{theme}_candidate" for theme in theme_list]].to_numpy()
+
+    # How often both backends agree on an episode's dominant theme(s)
+    top_k = min(3, len(theme_list))
+    reference_top = np.argsort(-reference_scores, axis=1)[:, :top_k]
+    candidate_top = np.argsort(-candidate_scores, axis=1)[:, :top_k]
+    top_k_overlap = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(reference_top, candidate_top)])
+
+    # Series-level ranking of themes, which is what the app's bar chart shows
+    series_spearman = pd.Series(reference_scores.sum(axis=0)).corr(pd.Series(candidate_scores.sum(axis=0)), method='spearman')
+
+    summary = {
+        'episodes': len(merged),
+        'top1_agreement': float(np.mean(reference_top[:, 0] == candidate_top[:, 0])),
+        f'top{top_k}_overlap': float(top_k_overlap),
+        'mean_spearman': float(per_theme_df['spearman'].mean()),
+        'series_ranking_spearman': float(series_spearman),
+    }
+    return per_theme_df, summary
+
+def main():
+    stubs_dir = os.path.join(os.path.dirname(__file__), '..', 'stubs')
+    parser = argparse.ArgumentParser(description="Agreement report of a theme backend against the NLI stub output")
+    parser.add_argument('--reference', default=os.path.join(stubs_dir, 'theme_classifier_output.csv'))
+    parser.add_argument('--backend', default='embedding')
+    parser.add_argument('--save-path', default=os.path.join(stubs_dir, 'theme_classifier_output_embedding.csv'))
+    args = parser.parse_args()
+
+    reference_df = pd.read_csv(args.reference)
+    theme_list = [column for column in reference_df.columns if column not in ('episode', 'script')]
+
+    # Scores the same scripts that produced the reference output
+    theme_classifier = ThemeClassifier(theme_list, backend=args.backend)
+    candidate_df = theme_classifier.get_themes(args.reference, args.save_path)
+
+    per_theme_df, summary = compare_theme_scores(reference_df, candidate_df, theme_list)
+    print(per_theme_df.to_string(index=False))
+    for key, value in summary.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import numpy as np
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+class EmbeddingThemeScorer():
+    # Fast zero-shot tier: every chunk is embedded once and every theme label
+    # once (cached), and a theme's score is the cosine similarity mapped to
+    # [0, 1]. Scoring N themes costs one forward pass per chunk instead of the
+    # N cross-encoder passes of the NLI pipeline, and adding a theme costs a
+    # single label embedding.
+    #
+    # Called like the zero-shot pipeline so ThemeClassifier can use either.
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, device='cpu', hypothesis_template="This text is about {}."):
+        self.model_name = model_name
+        self.device = 'cuda' if device == 0 else device
+        self.hypothesis_template = hypothesis_template
+
+        from transformers import AutoTokenizer, AutoModel
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.model = AutoModel.from_pretrained(self.model_name).to(self.device)
+        self.model.eval()
+        self.label_embeddings = {}
+
+    def embed(self, texts, batch_size=16):
+        import torch
+
+        embeddings = []
+        for index in range(0, len(texts), batch_size):
+            batch = self.tokenizer(texts[index:index+batch_size],
+                                   padding=True,
+                                   truncation=True,
+                                   return_tensors='pt').to(self.device)
+            with torch.no_grad():
+                token_embeddings = self.model(**batch).last_hidden_state
+
+            # Mean pooling over real tokens, then L2 normalise for cosine similarity
+            mask = batch['attention_mask'].unsqueeze(-1).to(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+            embeddings.append(pooled.cpu().numpy())
+
+        if not embeddings:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return np.concatenate(embeddings)
+
+    def get_label_embeddings(self, labels):
+        missing = [label for label in dict.fromkeys(labels) if label not in self.label_embeddings]
+        if missing:
+            vectors = self.embed([self.hypothesis_template.format(label) for label in missing])
+            self.label_embeddings.update(zip(missing, vectors))
+        return np.stack([self.label_embeddings[label] for label in labels])
+
+    def __call__(self, sequences, candidate_labels, multi_label=True, batch_size=16):
+        if isinstance(candidate_labels, str):
+            candidate_labels = [candidate_labels]
+
+        label_embeddings = self.get_label_embeddings(candidate_labels)
+        chunk_embeddings = self.embed(list(sequences), batch_size=batch_size)
+        scores = (chunk_embeddings @ label_embeddings.T + 1) / 2
+
+        # Same output layout as the zero-shot pipeline: labels sorted by score
+        output = []
+        for sequence, sequence_scores in zip(sequences, scores):
+            order = np.argsort(-sequence_scores, kind='stable')
+            output.append({
+                'sequence': sequence,
+                'labels': [candidate_labels[index] for index in order],
+                'scores': [float(sequence_scores[index]) for index in order],
+            })
+        return output
@@ -0,0 +1,59 @@
+import hashlib
+import os
+import sqlite3
+from contextlib import contextmanager
+
+class ThemeScoreCache():
+    # Scores cached per (chunk, theme, model). Zero-shot scores are computed
+    # independently for each theme (multi_label=True), so a new theme list
+    # only needs the (chunk, theme) pairs that were never scored.
+    def __init__(self, path):
+        self.path = str(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS theme_scores (
+                    chunk_key TEXT NOT NULL,
+                    theme TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (model, theme, chunk_key)
+                )
+            """)
+
+    @contextmanager
+    def connect(self):
+        # One short-lived connection per call, so instances can be shared across threads
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_chunk_key(self, chunk):
+        return hashlib.sha1(chunk.encode('utf-8')).hexdigest()
+
+    def get_scores(self, model, themes):
+        themes = list(dict.fromkeys(themes))
+        if not themes:
+            return {}
+
+        placeholders = ",".join("?" * len(themes))
+        with self.connect() as connection:
+            rows = connection.execute(
+                f"SELECT chunk_key, theme, score FROM theme_scores WHERE model = ? AND theme IN ({placeholders})",
+                [model] + themes
+            ).fetchall()
+        return {(chunk_key, theme): score for chunk_key, theme, score in rows}
+
+    def set_scores(self, model, rows):
+        # rows: iterable of (chunk_key, theme, score)
+        with self.connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO theme_scores (chunk_key, theme, model, score) VALUES (?, ?, ?, ?)",
+                [(chunk_key, theme, model, float(score)) for chunk_key, theme, score in rows]
+            )
@@ -1,37 +1,60 @@
-from transformers import pipeline
-import torch
-from nltk.tokenize import sent_tokenize
-import nltk
 import pandas as pd
 import numpy as np
 import os
 import sys
 import pathlib 
+import tempfile
 
 folder_path = pathlib.Path(__file__).parent.resolve()
 sys.path.append(os.path.join(folder_path,'../'))
-from utils import load_subtitles_dataset
- 
-nltk.download('punkt')
-nltk.download('punkt_tab')
+from utils import load_subtitles_dataset, iter_subtitles_batches, read_csv_columnar, write_csv_columnar, write_csv_batches, model_registry, sent_tokenize
+from .embedding_backend import EmbeddingThemeScorer, EMBEDDING_MODEL_NAME
+from .score_cache import ThemeScoreCache
+
+THEME_BACKENDS = ("nli", "embedding")
 
 class ThemeClassifier():
-    def __init__(self, theme_list):
-        self.model_name = "facebook/bart-large-mnli"
-        self.device = 0 if torch.cuda.is_available() else 'cpu'
+    def __init__(self, theme_list, batch_size=16, backend="nli", cache_path=None):
+        if backend not in THEME_BACKENDS:
+            raise ValueError(f"Unknown theme backend {backend}, expected one of {THEME_BACKENDS}")
+
+        self.backend = backend
+        self.model_name = "facebook/bart-large-mnli" if backend == "nli" else EMBEDDING_MODEL_NAME
+        self.device = None
         self.theme_list = theme_list
-        self.theme_classifier = self.load_model(self.device)
+        self.batch_size = batch_size
+        self.score_cache = ThemeScoreCache(cache_path) if cache_path is not None else None
+        self._theme_classifier = None
+
+    @property
+    def theme_classifier(self):
+        # Loaded on first inference, so outputs served from disk never pay for it
+        if self._theme_classifier is None:
+            import torch
+            self.device = 0 if torch.cuda.is_available() else 'cpu'
+            self._theme_classifier = self.load_model(self.device)
+        return self._theme_classifier
     
     def load_model(self,device):
-        theme_classifier = pipeline(
-            "zero-shot-classification",
-            model=self.model_name,
-            device=device
-        )
+        from transformers import pipeline
 
-        return theme_classifier
+        # Shared across ThemeClassifier instances through the process-wide registry
+        if self.backend == "embedding":
+            return model_registry.get(
+                ("embedding", self.model_name, str(device)),
+                lambda: EmbeddingThemeScorer(self.model_name, device=device)
+            )
 
-    def get_themes_inference(self, script):
+        return model_registry.get(
+            ("zero-shot-classification", self.model_name, str(device)),
+            lambda: pipeline(
+                "zero-shot-classification",
+                model=self.model_name,
+                device=device
+            )
+        )
+
+    def split_script(self, script):
         script_sentences = sent_tokenize(script)
 
         # Batch Sentence
@@ -40,44 +63,162 @@ class ThemeClassifier():
         for index in range(0,len(script_sentences),sentence_batch_size):
             sent = " ".join(script_sentences[index:index+sentence_batch_size])
             script_batches.append(sent)
-        
+        return script_batches
+
+    def get_themes_inference(self, script):
+        return self.get_themes_inference_batch([script])[0]
+
+    def score_chunks(self, chunks, theme_list):
+        # Run the chunks through the pipeline sorted by token length so each
+        # fixed-size batch pads to similar lengths
+        scores = np.zeros((len(chunks), len(theme_list)))
+        if not chunks or not theme_list:
+            return scores
+
+        lengths = [len(ids) for ids in self.theme_classifier.tokenizer(chunks, truncation=True)['input_ids']]
+        order = np.argsort(lengths, kind='stable')[::-1]
+
         # Run Model
         theme_output = self.theme_classifier(
-            script_batches,
-            self.theme_list,
-            multi_label=True
+            [chunks[index] for index in order],
+            list(dict.fromkeys(theme_list)),
+            multi_label=True,
+            batch_size=self.batch_size
         )
 
         # Wrangle Output 
-        themes = {}
-        for output in theme_output:
-            for label,score in zip(output['labels'],output['scores']):
-                if label not in themes:
-                    themes[label] = []
-                themes[label].append(score)
+        for chunk_index, output in zip(order, theme_output):
+            label_scores = dict(zip(output['labels'], output['scores']))
+            scores[chunk_index] = [label_scores[theme] for theme in theme_list]
+        return scores
+
+    def get_cache_model_key(self):
+        return f"{self.backend}:{self.model_name}"
+
+    def get_themes_inference_batch(self, scripts, theme_list=None):
+        # Gather the chunks of every script, score them in one corpus-level pass
+        # (reusing cached (chunk, theme) scores), then scatter the scores back
+        # to their scripts
+        if theme_list is None:
+            theme_list = self.theme_list
+
+        chunks = []
+        chunk_script = []
+        for script_index, script in enumerate(scripts):
+            script_batches = self.split_script(script)
+            chunks.extend(script_batches)
+            chunk_script.extend([script_index] * len(script_batches))
 
-        themes = {key: np.mean(np.array(value)) for key,value in themes.items()}
+        scores = np.full((len(chunks), len(theme_list)), np.nan)
+        chunk_keys = []
+        if self.score_cache is not None and chunks:
+            chunk_keys = [self.score_cache.get_chunk_key(chunk) for chunk in chunks]
+            cached_scores = self.score_cache.get_scores(self.get_cache_model_key(), theme_list)
+            for chunk_index, chunk_key in enumerate(chunk_keys):
+                for theme_index, theme in enumerate(theme_list):
+                    scores[chunk_index, theme_index] = cached_scores.get((chunk_key, theme), np.nan)
 
-        return themes
+        # Chunks missing the same set of themes are scored together
+        missing_groups = {}
+        for chunk_index in range(len(chunks)):
+            missing = tuple(np.nonzero(np.isnan(scores[chunk_index]))[0].tolist())
+            if missing:
+                missing_groups.setdefault(missing, []).append(chunk_index)
 
-    def get_themes(self,dtaset_path, save_path=None):
+        for missing, chunk_indices in missing_groups.items():
+            missing_themes = [theme_list[theme_index] for theme_index in missing]
+            missing_scores = self.score_chunks([chunks[index] for index in chunk_indices], missing_themes)
+            scores[np.ix_(chunk_indices, list(missing))] = missing_scores
+
+            if self.score_cache is not None:
+                self.score_cache.set_scores(self.get_cache_model_key(), [
+                    (chunk_keys[chunk_index], theme, missing_scores[row, column])
+                    for row, chunk_index in enumerate(chunk_indices)
+                    for column, theme in enumerate(missing_themes)
+                ])
+
+        if self.score_cache is not None and chunks:
+            inferred = sum(len(missing) * len(chunk_indices) for missing, chunk_indices in missing_groups.items())
+            print(f"Theme scores: {len(chunks) * len(theme_list) - inferred} reused from cache, {inferred} inferred")
+
+        totals = np.zeros((len(scripts), len(theme_list)))
+        np.add.at(totals, np.asarray(chunk_script, dtype=np.int64), scores)
+        counts = np.bincount(np.asarray(chunk_script, dtype=np.int64), minlength=len(scripts))
+
+        themes_list = []
+        for script_index in range(len(scripts)):
+            if counts[script_index] == 0:
+                themes_list.append({})
+                continue
+            means = totals[script_index] / counts[script_index]
+            themes_list.append({theme: means[index] for index, theme in enumerate(theme_list)})
+
+        return themes_list
+
+    def add_themes_columns(self, df, theme_list=None):
+        if theme_list is None:
+            theme_list = self.theme_list
+        output_themes = self.get_themes_inference_batch(df['script'].tolist(), theme_list)
+
+        themes_df = pd.DataFrame(output_themes, index=df.index, columns=theme_list)
+        df[themes_df.columns] = themes_df
+        return df
+
+    def iter_themes(self, dataset_path, episodes_per_batch=10, num_workers=1):
+        # Lazily run inference batch by batch so the whole corpus is never held in memory
+        for df in iter_subtitles_batches(dataset_path, episodes_per_batch, num_workers):
+            yield self.add_themes_columns(df)
+
+    def get_themes(self,dtaset_path, save_path=None, episodes_per_batch=None, num_workers=1, return_df=True):
         # Read Save Output if Exists
         if save_path is not None and os.path.exists(save_path):
-            df = pd.read_csv(save_path)
+            # Served from the memory-mapped columnar copy, converted from the CSV on first use
+            df = read_csv_columnar(save_path)
+
+            # Themes that were never scored are added from the saved scripts;
+            # the existing columns are reused as they are
+            missing_themes = [theme for theme in dict.fromkeys(self.theme_list) if theme not in df.columns]
+            if missing_themes:
+                df = self.add_themes_columns(df, missing_themes)
+                write_csv_columnar(df, save_path)
             return df
 
-        # load Dataset
-        df = load_subtitles_dataset(dtaset_path)
+        if episodes_per_batch is not None:
+            return self.get_themes_streaming(dtaset_path, save_path, episodes_per_batch, num_workers, return_df)
+
+        # load Dataset (a saved output CSV can also be used as the corpus, through its script column)
+        if str(dtaset_path).endswith('.csv'):
+            df = read_csv_columnar(dtaset_path)[['episode', 'script']].copy()
+        else:
+            df = load_subtitles_dataset(dtaset_path, num_workers=num_workers)
        
 
         # Run Inference
-        output_themes = df['script'].apply(self.get_themes_inference)
-
-        themes_df = pd.DataFrame(output_themes.tolist())
-        df[themes_df.columns] = themes_df
+        df = self.add_themes_columns(df)
 
         # Save output
         if save_path is not None:
-            df.to_csv(save_path,index=False)
+            write_csv_columnar(df, save_path)
         
-        return df
\ No newline at end of file
+        return df
+
+    def get_themes_streaming(self, dataset_path, save_path, episodes_per_batch, num_workers=1, return_df=True):
+        # Each batch is written out as soon as it is scored and then dropped, so
+        # only the batch in flight is held in memory. The finished output is read
+        # back only when return_df is set; with return_df=False the path is returned.
+        batches = self.iter_themes(dataset_path, episodes_per_batch, num_workers)
+        empty_df = lambda: pd.DataFrame(columns=['episode', 'script'] + self.theme_list)
+        if save_path is None:
+            # Nowhere to keep the output: the batches go to a temporary file instead of memory
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                tmp_path = os.path.join(tmp_dir, 'theme_output.csv')
+                if write_csv_batches(batches, tmp_path) == 0:
+                    return empty_df()
+                return pd.read_csv(tmp_path)
+
+        if write_csv_batches(batches, save_path) == 0:
+            return empty_df() if return_df else None
+        if not return_df:
+            return save_path
+        # Through the memory-mapped columnar copy, written on this first read
+        return read_csv_columnar(save_path)
@@ -1 +1,13 @@
-from .data_loader import load_subtitles_dataset
\ No newline at end of file
+from .data_loader import (load_subtitles_dataset,
+                          iter_subtitles_dataset,
+                          iter_subtitles_batches,
+                          load_subtitle_file)
+from .columnar_store import (read_csv_columnar,
+                             write_csv_columnar,
+                             write_csv_batches,
+                             save_columnar,
+                             load_columnar,
+                             load_entity_column,
+                             columnar_path_for)
+from .model_registry import model_registry, ModelRegistry
+from .nltk_resources import sent_tokenize, ensure_nltk_resource
\ No newline at end of file
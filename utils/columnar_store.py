@@ -0,0 +1,226 @@
+import json
+import os
+import shutil
+from ast import literal_eval
+import numpy as np
+import pandas as pd
+
+# On-disk layout: a directory next to the CSV (ner_output.csv -> ner_output.columns/)
+# holding meta.json plus one or more .npy files per column, so every array can be
+# memory-mapped and nothing has to be parsed when the table is loaded.
+#   numeric columns: <i>.values.npy
+#   string columns:  <i>.offsets.npy (n+1 byte offsets) + <i>.data.npy (utf-8 bytes)
+#   entity columns (list of sets of names per row, e.g. NER output):
+#       <i>.vocab.offsets.npy + <i>.vocab.data.npy  interned entity names
+#       <i>.row_offsets.npy       n+1 offsets of each row into the sentences
+#       <i>.sentence_offsets.npy  offsets of each sentence into the values
+#       <i>.values.npy            int32 entity ids
+FORMAT_VERSION = 1
+
+
+def columnar_path_for(csv_path):
+    return os.path.splitext(str(csv_path))[0] + '.columns'
+
+
+def encode_strings(strings):
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, data
+
+
+def decode_strings(offsets, data):
+    buffer = data.tobytes() if len(data) else b""
+    return [buffer[offsets[index]:offsets[index + 1]].decode('utf-8') for index in range(len(offsets) - 1)]
+
+
+class EntityColumn():
+    def __init__(self, vocab, row_offsets, sentence_offsets, values):
+        self.vocab = vocab
+        self.row_offsets = row_offsets
+        self.sentence_offsets = sentence_offsets
+        self.values = values
+
+    def __len__(self):
+        return len(self.row_offsets) - 1
+
+    @classmethod
+    def from_rows(cls, rows):
+        vocab = {}
+        row_offsets = [0]
+        sentence_offsets = [0]
+        values = []
+        for row in rows:
+            if not isinstance(row, (list, tuple)):
+                row = []
+            for sentence in row:
+                for entity in sentence:
+                    values.append(vocab.setdefault(entity, len(vocab)))
+                sentence_offsets.append(len(values))
+            row_offsets.append(len(sentence_offsets) - 1)
+
+        return cls(list(vocab),
+                   np.asarray(row_offsets, dtype=np.int64),
+                   np.asarray(sentence_offsets, dtype=np.int64),
+                   np.asarray(values, dtype=np.int32))
+
+    def to_rows(self):
+        vocab = self.vocab
+        values = self.values.tolist()
+        sentence_offsets = self.sentence_offsets.tolist()
+        row_offsets = self.row_offsets.tolist()
+
+        # Sets, like the NER output that was stored and the CSV's literal_eval,
+        # so a row reads the same whether or not it came through this copy
+        sentences = [{vocab[value] for value in values[start:end]}
+                     for start, end in zip(sentence_offsets[:-1], sentence_offsets[1:])]
+        return [sentences[start:end] for start, end in zip(row_offsets[:-1], row_offsets[1:])]
+
+
+def save_columnar(df, path, entity_columns=(), source_path=None):
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for index, name in enumerate(df.columns):
+        prefix = os.path.join(tmp_path, str(index))
+        series = df[name]
+
+        if name in entity_columns:
+            column = EntityColumn.from_rows(series.tolist())
+            vocab_offsets, vocab_data = encode_strings(column.vocab)
+            np.save(prefix + '.vocab.offsets.npy', vocab_offsets)
+            np.save(prefix + '.vocab.data.npy', vocab_data)
+            np.save(prefix + '.row_offsets.npy', column.row_offsets)
+            np.save(prefix + '.sentence_offsets.npy', column.sentence_offsets)
+            np.save(prefix + '.values.npy', column.values)
+            kind = 'entities'
+        elif series.dtype.kind in 'biuf':
+            np.save(prefix + '.values.npy', series.to_numpy())
+            kind = 'numeric'
+        else:
+            nulls = series.isna().to_numpy()
+            offsets, data = encode_strings(series.fillna('').astype(str).tolist())
+            np.save(prefix + '.offsets.npy', offsets)
+            np.save(prefix + '.data.npy', data)
+            np.save(prefix + '.nulls.npy', nulls)
+            kind = 'string'
+
+        columns.append({'name': name, 'kind': kind})
+
+    meta = {'version': FORMAT_VERSION, 'num_rows': len(df), 'columns': columns}
+    if source_path is not None:
+        stat = os.stat(source_path)
+        meta['source'] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+
+    # Swap the finished directory into place
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def read_meta(path):
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def is_columnar_fresh(path, source_path):
+    meta = read_meta(path)
+    if meta is None or meta.get('version') != FORMAT_VERSION:
+        return False
+    if source_path is None or not os.path.exists(source_path):
+        return True
+
+    stat = os.stat(source_path)
+    return meta.get('source') == {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_entity_column(path, name, mmap_mode='r'):
+    meta = read_meta(path)
+    for index, column in enumerate(meta['columns']):
+        if column['name'] == name and column['kind'] == 'entities':
+            prefix = os.path.join(path, str(index))
+            vocab = decode_strings(np.load(prefix + '.vocab.offsets.npy', mmap_mode=mmap_mode),
+                                   np.load(prefix + '.vocab.data.npy', mmap_mode=mmap_mode))
+            return EntityColumn(vocab,
+                                np.load(prefix + '.row_offsets.npy', mmap_mode=mmap_mode),
+                                np.load(prefix + '.sentence_offsets.npy', mmap_mode=mmap_mode),
+                                np.load(prefix + '.values.npy', mmap_mode=mmap_mode))
+    raise KeyError(f"{name} is not an entity column of {path}")
+
+
+def load_columnar(path, mmap_mode='r'):
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"No columnar table found at {path}")
+
+    data = {}
+    for index, column in enumerate(meta['columns']):
+        prefix = os.path.join(path, str(index))
+        name = column['name']
+
+        if column['kind'] == 'entities':
+            data[name] = load_entity_column(path, name, mmap_mode).to_rows()
+        elif column['kind'] == 'numeric':
+            data[name] = np.load(prefix + '.values.npy', mmap_mode=mmap_mode)
+        else:
+            strings = decode_strings(np.load(prefix + '.offsets.npy', mmap_mode=mmap_mode),
+                                     np.load(prefix + '.data.npy', mmap_mode=mmap_mode))
+            nulls = np.load(prefix + '.nulls.npy', mmap_mode=mmap_mode)
+            if nulls.any():
+                strings = [None if null else string for null, string in zip(nulls.tolist(), strings)]
+            data[name] = strings
+
+    return pd.DataFrame(data, columns=[column['name'] for column in meta['columns']])
+
+
+def read_csv_columnar(csv_path, entity_columns=()):
+    # Loads a CSV stub through its columnar copy, converting it on first use
+    # (or whenever the CSV changed since the last conversion)
+    csv_path = str(csv_path)
+    path = columnar_path_for(csv_path)
+    if is_columnar_fresh(path, csv_path):
+        return load_columnar(path)
+
+    df = pd.read_csv(csv_path)
+    for name in entity_columns:
+        df[name] = df[name].apply(lambda x: literal_eval(x) if isinstance(x,str) else x)
+
+    try:
+        save_columnar(df, path, entity_columns=entity_columns, source_path=csv_path)
+    except OSError as e:
+        print(f"Could not write columnar cache {path}: {e}")
+    return df
+
+
+def write_csv_batches(batches, csv_path):
+    # Appends each DataFrame to the CSV as it arrives and keeps none of them,
+    # then moves the file into place so an interrupted run never leaves a
+    # partial output behind. Returns the number of rows written.
+    csv_path = str(csv_path)
+    tmp_path = csv_path + '.tmp'
+    num_batches = 0
+    num_rows = 0
+    for df in batches:
+        df.to_csv(tmp_path, index=False, mode='w' if num_batches == 0 else 'a', header=num_batches == 0)
+        num_batches += 1
+        num_rows += len(df)
+
+    if num_batches:
+        os.replace(tmp_path, csv_path)
+    return num_rows
+
+
+def write_csv_columnar(df, csv_path, entity_columns=()):
+    csv_path = str(csv_path)
+    df.to_csv(csv_path, index=False)
+    save_columnar(df, columnar_path_for(csv_path), entity_columns=entity_columns, source_path=csv_path)
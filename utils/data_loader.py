@@ -1,27 +1,70 @@
-from glob import glob 
+from glob import glob
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import pandas as pd
 
-def load_subtitles_dataset(dataset_path):
+def get_episode_number(path):
+    return int(path.split('-')[-1].split('.')[0].strip())
+
+def get_subtitles_paths(dataset_path):
     subtitles_paths = glob(dataset_path+'/*.ass')
+    return sorted(subtitles_paths, key=get_episode_number)
+
+def load_subtitle_file(path):
+    #Read Lines, skipping the 27 line .ass header without loading the whole file
+    with open(path,'r',  encoding='utf-8') as file:
+        lines = [ ",".join(line.split(',')[9:])  for line in islice(file, 27, None) ]
+
+    lines = [ line.replace('\\N',' ') for line in lines]
+    script = " ".join(lines)
+
+    episode = get_episode_number(path)
+    return episode, script
 
-    scripts=[]
-    episode_num=[]
+def iter_subtitles_dataset(dataset_path, num_workers=1, max_pending=None):
+    # Yields (episode, script) one episode at a time, in episode order.
+    # With num_workers > 1 files are parsed in a process pool, but at most
+    # max_pending parsed scripts are held in memory ahead of the consumer.
+    subtitles_paths = get_subtitles_paths(dataset_path)
 
-    for path in subtitles_paths:
+    if num_workers is None or num_workers <= 1:
+        for path in subtitles_paths:
+            yield load_subtitle_file(path)
+        return
 
-        #Read Lines
-        with open(path,'r',  encoding='utf-8') as file:
-            lines = file.readlines()
-            lines = lines[27:]
-            lines =  [ ",".join(line.split(',')[9:])  for line in lines ]
-        
-        lines = [ line.replace('\\N',' ') for line in lines]
-        script = " ".join(lines)
+    if max_pending is None:
+        max_pending = num_workers * 2
 
-        episode = int(path.split('-')[-1].split('.')[0].strip())
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for path in subtitles_paths:
+            pending.append(executor.submit(load_subtitle_file, path))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
 
-        scripts.append(script)
-        episode_num.append(episode)
+        while pending:
+            yield pending.popleft().result()
 
+def episodes_to_dataframe(episodes):
+    episode_num = [episode for episode, _ in episodes]
+    scripts = [script for _, script in episodes]
     df = pd.DataFrame.from_dict({"episode":episode_num, "script":scripts })
-    return df
\ No newline at end of file
+    return df
+
+def iter_subtitles_batches(dataset_path, episodes_per_batch=10, num_workers=1):
+    # Bounded-memory mode: yields DataFrames of at most episodes_per_batch episodes
+    batch = []
+    for episode in iter_subtitles_dataset(dataset_path, num_workers=num_workers):
+        batch.append(episode)
+        if len(batch) >= episodes_per_batch:
+            yield episodes_to_dataframe(batch)
+            batch = []
+
+    if batch:
+        yield episodes_to_dataframe(batch)
+
+def load_subtitles_dataset(dataset_path, num_workers=1):
+    episodes = list(iter_subtitles_dataset(dataset_path, num_workers=num_workers))
+    df = episodes_to_dataframe(episodes)
+    return df
@@ -0,0 +1,78 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Only needed once a model runs, a chat is sent or a graph is drawn; none of
+# them may be imported when the app starts
+DEFERRED_MODULES = ("torch", "transformers", "spacy", "nltk", "sklearn", "datasets",
+                    "evaluate", "huggingface_hub", "google.generativeai", "pyvis", "networkx")
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def profile_imports(module="app", cwd=REPO_DIR):
+    # Imports `module` in a fresh interpreter under -X importtime. Returns
+    # {module: (self_ms, cumulative_ms, depth)} and the wall time of the process.
+    # The stdin is closed so nothing that prompts can block the run.
+    start_time = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    wall_seconds = time.perf_counter() - start_time
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings[name] = (int(self_us) / 1000, int(cumulative_us) / 1000, (len(indent) - 1) // 2)
+    return timings, wall_seconds
+
+def get_package_totals(timings):
+    # Cumulative time per top-level package, counted where it was first imported
+    totals = {}
+    for name, (_, cumulative_ms, _) in timings.items():
+        package = name.split('.')[0]
+        if package not in totals or name == package:
+            totals[package] = max(totals.get(package, 0.0), cumulative_ms)
+    return totals
+
+def get_deferred_imports(timings, deferred_modules=DEFERRED_MODULES):
+    return [module for module in deferred_modules
+            if any(name == module or name.startswith(module + '.') for name in timings)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-module import time of the app, with a startup budget")
+    parser.add_argument('--module', default="app")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help="exit with status 1 when importing the module takes longer")
+    args = parser.parse_args()
+
+    timings, wall_seconds = profile_imports(args.module)
+    total_ms = sum(cumulative_ms for _, cumulative_ms, depth in timings.values() if depth == 0)
+
+    print(f"import {args.module}: {total_ms:.0f} ms of imports, {wall_seconds*1000:.0f} ms wall "
+          f"(interpreter start included), {len(timings)} modules")
+    print("   slowest packages (cumulative):")
+    for package, cumulative_ms in sorted(get_package_totals(timings).items(), key=lambda item: -item[1])[:args.top]:
+        print(f"      {cumulative_ms:9.1f} ms  {package}")
+    print("   slowest modules (self):")
+    for name, (self_ms, _, _) in sorted(timings.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"      {self_ms:9.1f} ms  {name}")
+
+    failures = []
+    deferred = get_deferred_imports(timings)
+    if deferred:
+        failures.append(f"imported at startup, should be deferred: {', '.join(deferred)}")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"{total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
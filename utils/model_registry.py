@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def get_resident_bytes():
+    # Current resident set size of the process (Linux); None elsewhere
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            resident_pages = int(file.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def get_tensor_bytes(value):
+    # Quantized layers keep their packed weights as tuples of tensors in the state dict
+    if isinstance(value, (tuple, list)):
+        return sum(get_tensor_bytes(item) for item in value)
+    if hasattr(value, 'numel') and hasattr(value, 'element_size'):
+        return value.numel() * value.element_size()
+    return 0
+
+def get_torch_bytes(module):
+    state_dict = getattr(module, 'state_dict', None)
+    if not callable(state_dict):
+        return None
+    return sum(get_tensor_bytes(value) for value in module.state_dict().values())
+
+def estimate_model_size(model):
+    # torch modules and transformers pipelines are measured from their tensors
+    for candidate in (model, getattr(model, 'model', None)):
+        if candidate is None:
+            continue
+        try:
+            size = get_torch_bytes(candidate)
+        except Exception:
+            size = None
+        if size:
+            return size
+    return None
+
+class ModelRegistry():
+    # Loads each model once per process, keyed by model name and configuration,
+    # and evicts the least recently used models once the estimated resident
+    # size of everything it holds exceeds max_bytes (None = no limit).
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.models = OrderedDict()
+        self.sizes = {}
+        self.stats = {}
+        self.loading_locks = {}
+
+    def get_key_stats(self, key):
+        if key not in self.stats:
+            self.stats[key] = {'loads': 0, 'hits': 0, 'evictions': 0, 'load_seconds': 0.0}
+        return self.stats[key]
+
+    def get(self, key, loader):
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                self.get_key_stats(key)['hits'] += 1
+                return self.models[key]
+            loading_lock = self.loading_locks.setdefault(key, threading.Lock())
+
+        # Concurrent requests for the same model wait for a single load
+        with loading_lock:
+            with self.lock:
+                if key in self.models:
+                    self.models.move_to_end(key)
+                    self.get_key_stats(key)['hits'] += 1
+                    return self.models[key]
+
+            resident_before = get_resident_bytes()
+            start_time = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start_time
+
+            size = estimate_model_size(model)
+            if size is None:
+                # e.g. spaCy pipelines: fall back to the growth of the process
+                resident_after = get_resident_bytes()
+                if resident_before is not None and resident_after is not None:
+                    size = max(resident_after - resident_before, 0)
+                else:
+                    size = 0
+
+            with self.lock:
+                self.models[key] = model
+                self.sizes[key] = size
+                key_stats = self.get_key_stats(key)
+                key_stats['loads'] += 1
+                key_stats['load_seconds'] += load_seconds
+                self.evict_to_budget(keep=key)
+
+        return model
+
+    def get_resident_size(self):
+        with self.lock:
+            return sum(self.sizes.get(key, 0) for key in self.models)
+
+    def evict_to_budget(self, keep=None):
+        if self.max_bytes is None:
+            return
+
+        with self.lock:
+            while self.get_resident_size() > self.max_bytes:
+                candidates = [key for key in self.models if key != keep]
+                if not candidates:
+                    break
+                self.evict(candidates[0])
+
+    def evict(self, key):
+        with self.lock:
+            if key not in self.models:
+                return False
+            del self.models[key]
+            self.sizes.pop(key, None)
+            self.get_key_stats(key)['evictions'] += 1
+
+        # Release cached GPU memory held by the evicted model, if any
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        return True
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.models):
+                self.evict(key)
+
+    def get_stats(self):
+        with self.lock:
+            models = {}
+            for key, key_stats in self.stats.items():
+                models[key] = dict(key_stats,
+                                   resident=key in self.models,
+                                   size_bytes=self.sizes.get(key, 0))
+            return {
+                'max_bytes': self.max_bytes,
+                'resident_bytes': self.get_resident_size(),
+                'resident_models': len(self.models),
+                'models': models,
+            }
+
+def get_default_max_bytes():
+    max_mb = os.getenv('MODEL_REGISTRY_MAX_MB')
+    if not max_mb:
+        return None
+    return int(float(max_mb) * 1024 * 1024)
+
+# Shared by every handler in the process
+model_registry = ModelRegistry(max_bytes=get_default_max_bytes())
@@ -0,0 +1,27 @@
+# nltk.download() asks the index server even when the data is already
+# installed, so resources are looked up on disk first and fetched at most
+# once per process, on first use instead of at import
+NLTK_RESOURCE_PATHS = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+}
+available_resources = set()
+
+def ensure_nltk_resource(name):
+    if name in available_resources:
+        return
+    import nltk
+    try:
+        nltk.data.find(NLTK_RESOURCE_PATHS[name])
+    except LookupError:
+        if not nltk.download(name, quiet=True):
+            # Not remembered, so the download is tried again on the next use
+            return
+    available_resources.add(name)
+
+def sent_tokenize(text):
+    # nltk itself takes over a second to import, so it is imported here
+    from nltk.tokenize import sent_tokenize as nltk_sent_tokenize
+    ensure_nltk_resource('punkt')
+    ensure_nltk_resource('punkt_tab')
+    return nltk_sent_tokenize(text)